@@ -1,3 +1,4 @@
+import heapq
 import json
 import time
 import sys
@@ -130,24 +131,66 @@ print("Press T to start/resume, P to stop.")
 while not activated:
     time.sleep(0.05)
 
-start_time = time.time()
-
-for note in notes:
-    if stopped:
-        break
-
-    wait_time = start_time + note['time'] - time.time()
-    if wait_time > 0:
-        time.sleep(wait_time)
-
-    if not activated:
+# ===== concurrent hold engine =====
+# Every note gets its own release deadline in one heap with the presses, so any number of keys
+# can be held at once and a sustain never delays a note on another lane. A note on a lane
+# that is still held releases it RELEASE_GAP before the re-press, even if that cuts the hold
+# short; a note no more than RELEASE_GAP after the previous press on its lane is dropped.
+TAP_HOLD = 0.02
+RELEASE_GAP = 0.01
+SPIN_THRESHOLD = 0.002  # last stretch before a deadline is busy-waited
+RELEASE, PRESS = 0, 1  # releases sort first when a release and a press share a deadline
+
+actions = []
+pressed = {}  # lane -> (press time, index of its release in actions)
+for seq, note in enumerate(notes):
+    lane = note['lane']
+    previous = pressed.get(lane)
+    if previous is not None:
+        pressed_at, release_slot = previous
+        if note['time'] - pressed_at <= RELEASE_GAP:
+            continue  # same lane twice within the gap: one press
+        if actions[release_slot][0] > note['time'] - RELEASE_GAP:
+            actions[release_slot] = (note['time'] - RELEASE_GAP,) + actions[release_slot][1:]
+    actions.append((note['time'], PRESS, 2 * seq, lane))
+    actions.append((note['time'] + max(note['length'], TAP_HOLD), RELEASE, 2 * seq + 1, lane))
+    pressed[lane] = (note['time'], len(actions) - 1)
+heapq.heapify(actions)
+
+held = set()
+lateness = {PRESS: [], RELEASE: []}
+start_time = time.perf_counter()
+
+while actions and not stopped:
+    at, kind, _, lane = actions[0]
+    deadline = start_time + at
+    remaining = deadline - time.perf_counter()
+    if remaining > SPIN_THRESHOLD:
+        time.sleep(min(remaining - SPIN_THRESHOLD, 0.01))  # short sleeps so P is noticed quickly
         continue
-
-    key = mapping[note['lane']]
-    print(f"[{time.time() - start_time:.3f}s] Pressing: {key}")
-    keyboard.press(key)
-    if note['length'] > 0:
-        time.sleep(note['length'])
+    while time.perf_counter() < deadline:
+        pass
+    heapq.heappop(actions)
+    key = mapping[lane]
+    if kind == PRESS:
+        if not activated:
+            continue  # paused: notes are skipped, the song clock keeps running
+        keyboard.press(key)
+        lateness[PRESS].append((time.perf_counter() - deadline) * 1000.0)
+        held.add(key)
+        print(f"[{time.perf_counter() - start_time:.3f}s] Pressing: {key}")  # console output only after the key is out
+    elif key in held:
+        keyboard.release(key)
+        lateness[RELEASE].append((time.perf_counter() - deadline) * 1000.0)
+        held.discard(key)
+
+for key in held:
     keyboard.release(key)
 
+for kind, name in ((PRESS, 'presses'), (RELEASE, 'releases')):
+    values = sorted(lateness[kind])
+    if values:
+        pick = lambda pct: values[min(len(values) - 1, int(len(values) * pct / 100))]
+        print(f"Lateness {name}: n={len(values)} p50={pick(50):.3f} p95={pick(95):.3f} p99={pick(99):.3f} max={values[-1]:.3f} ms")
+
 print("Song finished or stopped.")
@@ -1,16 +1,17 @@
 # play_fnf_stop_with_T.py
 # Usage:
 #   pip install pynput
-#   python play_fnf_stop_with_T.py /path/to/your_chart.json
+#   python play_fnf_stop_with_T.py /path/to/your_chart.json [--dry-run]
 #
 # Press 'T' anytime to immediately stop playback and release any held keys.
+# --dry-run plays the chart without pynput or key events and only prints the lateness report.
 # NOTE: pynput may require elevated privileges on some OSes to send global key events.
 
+import heapq
 import json
 import sys
 import time
 import threading
-from pynput.keyboard import Controller, KeyCode, Listener
 
 def load_notes_from_file(path):
     with open(path, 'r', encoding='utf-8') as f:
@@ -32,10 +33,10 @@ def load_notes_from_file(path):
 
 # map 0..3 to keys requested
 KEY_MAP = {
-    0: KeyCode.from_char('a'),
-    1: KeyCode.from_char('s'),
-    2: KeyCode.from_char(';'),
-    3: KeyCode.from_char("'"),
+    0: 'a',
+    1: 's',
+    2: ';',
+    3: "'",
 }
 
 def filter_player_notes(events):
@@ -48,16 +49,34 @@ def filter_player_notes(events):
         filtered.append((t / 1000.0, idx, length / 1000.0))  # convert ms -> seconds
     return filtered
 
+# last stretch before a deadline is busy-waited; Event.wait() alone can overshoot by an OS tick
+SPIN_THRESHOLD = 0.002
+
+def wait_until(target, stop_event):
+    """Block until perf_counter() reaches target. Returns False if stop_event was set first.
+
+    The listener thread sets stop_event, so Event.wait() wakes the moment 'T' is pressed
+    instead of noticing it on the next poll.
+    """
+    remaining = target - time.perf_counter()
+    if remaining > SPIN_THRESHOLD and stop_event.wait(remaining - SPIN_THRESHOLD):
+        return False
+    while time.perf_counter() < target:
+        pass
+    return not stop_event.is_set()
+
 def start_stop_listener(stop_event):
     # Listener that sets stop_event when 't' or 'T' is pressed
+    from pynput.keyboard import Listener
+
     def on_press(key):
         try:
             ch = key.char
         except AttributeError:
             ch = None
         if ch and ch.lower() == 't':
+            stop_event.set()  # wake any waiter first, print after
             print("\n'T' detected — stopping playback...")
-            stop_event.set()
             # returning False stops the listener thread
             return False
 
@@ -66,89 +85,128 @@ def start_stop_listener(stop_event):
     listener.start()
     return listener
 
-def play_events(events, pre_delay=3.0):
-    keyboard = Controller()
-    stop_event = threading.Event()
-    listener = start_stop_listener(stop_event)
+class DryController:
+    """Stands in for pynput's Controller in --dry-run: timing is measured, no key is sent."""
+    def press(self, key):
+        pass
+
+    def release(self, key):
+        pass
+
+# taps are held this long; a lane is let go this long before its next press (jacks, notes inside a sustain)
+TAP_HOLD = 0.02
+RELEASE_GAP = 0.01
+RELEASE, PRESS = 0, 1  # releases sort first when a release and a press share a deadline
+
+def build_actions(events):
+    """Turn (time_sec, note_index, hold_sec) notes into one sorted list of (time, kind, seq, note_index).
+
+    Every note gets its own release deadline, so any number of keys can be held at once and a
+    sustain on one lane never delays a press on another. A note on a lane that is still held
+    releases that lane RELEASE_GAP before it, even if that cuts the earlier hold short; a note
+    no more than RELEASE_GAP after the previous press on its lane is dropped (no room to let go).
+    """
+    actions = []
+    pressed = {}  # note_index -> (press time, index of its release in actions)
+    for seq, (t_sec, idx, length_sec) in enumerate(events):
+        previous = pressed.get(idx)
+        if previous is not None:
+            pressed_at, release_slot = previous
+            if t_sec - pressed_at <= RELEASE_GAP:
+                continue  # Same lane twice within the gap: one press
+            if actions[release_slot][0] > t_sec - RELEASE_GAP:
+                actions[release_slot] = (t_sec - RELEASE_GAP,) + actions[release_slot][1:]
+        actions.append((t_sec, PRESS, 2 * seq, idx))
+        actions.append((t_sec + max(length_sec, TAP_HOLD), RELEASE, 2 * seq + 1, idx))
+        pressed[idx] = (t_sec, len(actions) - 1)
+    actions.sort()
+    return actions
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * pct / 100.0))]
+
+def print_lateness(lateness):
+    """lateness: kind -> list of (actual - scheduled) seconds."""
+    print("Lateness (scheduled -> key call returned):")
+    for kind, name in ((PRESS, 'presses'), (RELEASE, 'releases')):
+        values = sorted(v * 1000.0 for v in lateness[kind])
+        if values:
+            print(f"  {name:8}: n={len(values)} p50={percentile(values, 50):.3f} p95={percentile(values, 95):.3f} "
+                  f"p99={percentile(values, 99):.3f} max={values[-1]:.3f} ms")
+
+def play_events(events, pre_delay=3.0, dry_run=False):
+    if dry_run:
+        keyboard = DryController()
+        keys = dict(KEY_MAP)
+        stop_event = threading.Event()
+        listener = None
+        pre_delay = 0.0
+    else:
+        from pynput.keyboard import Controller, KeyCode
+        keyboard = Controller()
+        keys = {idx: KeyCode.from_char(ch) for idx, ch in KEY_MAP.items()}
+        stop_event = threading.Event()
+        listener = start_stop_listener(stop_event)
 
     print(f"Starting in {pre_delay} seconds... focus the FNF window now. Press 'T' to abort.")
-    # allow abort during pre-delay
-    start_time = time.perf_counter() + pre_delay
-    while True:
-        if stop_event.is_set():
-            print("Aborted before start.")
-            return
-        now = time.perf_counter()
-        if now >= start_time:
-            break
-        time.sleep(0.01)
-
-    start = time.perf_counter()
-    currently_held_key = None
+    # allow abort during pre-delay; the chart clock starts at the deadline itself, not whenever we woke
+    start = time.perf_counter() + pre_delay
+    if not wait_until(start, stop_event):
+        print("Aborted before start.")
+        return
+
+    # one heap of press and release deadlines; held maps each held key to its note index
+    queue = build_actions(events)
+    heapq.heapify(queue)
+    held = {}
+    lateness = {PRESS: [], RELEASE: []}
 
     try:
-        for t_sec, idx, length_sec in events:
-            if stop_event.is_set():
+        while queue:
+            t_sec, kind, _, idx = queue[0]
+            # sleep until the next deadline, waking early only if 'T' is pressed
+            if not wait_until(start + t_sec, stop_event):
                 break
-            target = start + t_sec
-            now = time.perf_counter()
-            wait = target - now
-            # sleep in small increments so we can check stop_event frequently
-            if wait > 0:
-                end_wait = now + wait
-                while time.perf_counter() < end_wait:
-                    if stop_event.is_set():
-                        break
-                    # sleep short chunk
-                    time.sleep(0.002)
-                if stop_event.is_set():
-                    break
-
-            # Press the mapped key
-            key = KEY_MAP[idx]
-            keyboard.press(key)
-            currently_held_key = key
-
-            # Hold for length_sec, but allow early abort
-            if length_sec and length_sec > 0:
-                end_hold = time.perf_counter() + length_sec
-                while time.perf_counter() < end_hold:
-                    if stop_event.is_set():
-                        break
-                    time.sleep(0.002)
+            heapq.heappop(queue)
+            key = keys[idx]
+            if kind == PRESS:
+                keyboard.press(key)
+                held[key] = idx
             else:
-                # short tap
-                time.sleep(0.02)
-
-            # Release key if still held
-            try:
-                keyboard.release(key)
-            except Exception:
-                pass
-            currently_held_key = None
+                try:
+                    keyboard.release(key)
+                except Exception:
+                    pass
+                held.pop(key, None)
+            lateness[kind].append(time.perf_counter() - (start + t_sec))
 
         if stop_event.is_set():
             print("Playback stopped by user.")
         else:
             print("Playback finished.")
+        print_lateness(lateness)
     finally:
-        # ensure any held key is released
-        if currently_held_key is not None:
+        # ensure every held key is released
+        for key in held:
             try:
-                keyboard.release(currently_held_key)
+                keyboard.release(key)
             except Exception:
                 pass
         # ensure listener is stopped
-        try:
-            listener.stop()
-        except Exception:
-            pass
+        if listener is not None:
+            try:
+                listener.stop()
+            except Exception:
+                pass
 
 if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print("Usage: python play_fnf_stop_with_T.py /path/to/chart.json")
+    args = [arg for arg in sys.argv[1:] if arg != '--dry-run']
+    if not args:
+        print("Usage: python play_fnf_stop_with_T.py /path/to/chart.json [--dry-run]")
         sys.exit(1)
-    path = sys.argv[1]
+    path = args[0]
     events_raw = load_notes_from_file(path)
     events = filter_player_notes(events_raw)
     if not events:
@@ -158,4 +216,4 @@ if __name__ == '__main__':
     print("First 10 playable events (time_sec, note_index, hold_sec):")
     for e in events[:10]:
         print(e)
-    play_events(events)
+    play_events(events, dry_run='--dry-run' in sys.argv[1:])
@@ -1,23 +1,46 @@
+import time  # For timing playback loop and note scheduling
+
+# Taken before every other import; main() reports how long it took to get armed
+LAUNCHED_AT = time.perf_counter()
+
+import atexit  # Flush the log writer even if the script crashes
+import bisect  # Seeking into the time-sorted timeline
+import codecs  # Incremental UTF-8 decoding while streaming charts
+import hashlib  # Content hashes for the compiled chart cache
+import heapq  # Priority queue of press/release deadlines
 import json  # For reading chart and preset JSON files
+import math  # Percentiles for timing reports
+import mmap  # Memory-mapped loading of cached note tables
 import os    # For filesystem path manipulations and directory creation
-import time  # For timing playback loop and note scheduling
+import re  # Whitespace skipping in the chart format sniffer
+import struct  # Binary header of cached note tables
+import threading  # Background log writer
+from array import array  # Compact typed columns for the note table
+from collections import deque, namedtuple  # Log ring buffer; lightweight records for compiled playback actions
 from datetime import datetime  # For timestamped logging & log file naming
 
-# Attempt to import the keyboard library which simulates key presses.
-# If it's not installed, we instruct the user how to install it and exit.
-try:
-    import keyboard  # pip install keyboard
-except ImportError:
-    print("Please install the 'keyboard' module: pip install keyboard")
-    exit(1)
+# NumPy is optional: when installed it speeds up whole-column operations (sorting) on the note table.
+# Like the key backends (keyboard, pynput) it is imported on first use, so launching stays fast.
+_numpy = False  # False = not imported yet, None = not installed
 
-# Directory that stores user presets (saved configuration answers)
+def load_numpy():
+    """Return the numpy module, or None if it is not installed."""
+    global _numpy
+    if _numpy is False:
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+        _numpy = np
+    return _numpy
+
+# Directory that stores user presets (saved configuration answers); created on first save
 PRESETS_DIR = os.path.join(os.path.dirname(__file__), 'Presets')
-if not os.path.exists(PRESETS_DIR):
-    os.makedirs(PRESETS_DIR)
 
 def list_presets():
     """Return a list of preset names (without .json extension)."""
+    if not os.path.isdir(PRESETS_DIR):
+        return []
     return [f[:-5] for f in os.listdir(PRESETS_DIR) if f.endswith('.json')]
 
 def load_preset(name):
@@ -30,6 +53,8 @@ def load_preset(name):
 
 def save_preset(name, data):
     """Persist a preset dictionary to disk as JSON."""
+    if not os.path.exists(PRESETS_DIR):
+        os.makedirs(PRESETS_DIR)
     path = os.path.join(PRESETS_DIR, name + '.json')
     with open(path, 'w', encoding='utf-8') as f:
         json.dump(data, f, indent=2)
@@ -47,162 +72,874 @@ def normalize_key(raw):
         return 'space'
     return raw
 
-# Directory storing timestamped log files
+# Directory storing timestamped log files; created when the first log is written
 LOGS_DIR = os.path.join(os.path.dirname(__file__), 'Logs')
-if not os.path.exists(LOGS_DIR):
-    os.makedirs(LOGS_DIR)
+
+# SQLite catalog of indexed charts (built with --index, queried by the chart prompts)
+CATALOG_PATH = os.path.join(os.path.dirname(__file__), 'catalog.sqlite')
+
+# Directory storing compiled (binary) note tables so repeat runs skip JSON parsing
+CACHE_DIR = os.path.join(os.path.dirname(__file__), 'Cache')
+CACHE_MAX_BYTES = 64 * 1024 * 1024  # Least recently used entries are evicted above this total size
 
 def get_log_file():
     """Return a unique log file path using current datetime."""
+    if not os.path.exists(LOGS_DIR):
+        os.makedirs(LOGS_DIR)
     timestamp = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
     return os.path.join(LOGS_DIR, f'fnf_run_{timestamp}.txt')
 
+# Log levels (lower = more verbose). Presets can pick one with "log_level".
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+LOG_LEVELS = {'DEBUG': DEBUG, 'INFO': INFO, 'WARNING': WARNING, 'ERROR': ERROR}
+
 class Logger:
-    """Simple buffered logger that prints and also collects lines for a file."""
-    def __init__(self, log_path):
+    """Level-gated logger that keeps console and file I/O off the real-time path.
+
+    log() only checks the level and appends (perf_counter timestamp, level, message, args) to a
+    bounded ring buffer. A background writer thread drains the buffer every flush_interval,
+    formats timestamps and messages, prints them and streams them to the log file, so a crash
+    loses at most the last few milliseconds. If the buffer overflows the oldest records are
+    dropped and counted.
+    """
+    def __init__(self, log_path, level=INFO, console=True, buffer_size=65536, flush_interval=0.05):
         self.log_path = log_path  # Destination file
-        self.lines = []           # In-memory accumulation
-    def log(self, msg):
-        """Timestamp and record a message (also print to console)."""
-        ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-        log_entry = f'[{ts}] {msg}'
-        print(log_entry)
-        self.lines.append(log_entry)
+        self.level = level
+        self.console = console
+        self.flush_interval = flush_interval
+        self.buffer = deque(maxlen=buffer_size)  # Ring buffer of raw records
+        self.dropped = 0
+        # perf_counter -> wall clock anchor so timestamps can be formatted later by the writer
+        self._wall_anchor = time.time()
+        self._perf_anchor = time.perf_counter()
+        self._file = open(log_path, 'w', encoding='utf-8')
+        self._closed = threading.Event()
+        self._writer = threading.Thread(target=self._write_loop, name='log-writer', daemon=True)
+        self._writer.start()
+        atexit.register(self.save)
+
+    def set_level(self, level):
+        """Change the minimum level; accepts a number or a name like 'DEBUG'."""
+        if isinstance(level, str):
+            level = LOG_LEVELS.get(level.upper(), INFO)
+        self.level = level
+
+    def enabled(self, level):
+        """True if records of this level are kept (use to skip building expensive messages)."""
+        return level >= self.level
+
+    def log(self, msg, *args, level=INFO):
+        """Queue a message. Extra args are str.format()ed into msg later by the writer thread."""
+        if level < self.level:
+            return
+        buffer = self.buffer
+        if len(buffer) == buffer.maxlen:
+            self.dropped += 1
+        buffer.append((time.perf_counter(), level, msg, args))
+
+    def debug(self, msg, *args):
+        if DEBUG >= self.level:
+            self.log(msg, *args, level=DEBUG)
+
+    def warning(self, msg, *args):
+        self.log(msg, *args, level=WARNING)
+
+    def _format(self, record):
+        perf_ts, level, msg, args = record
+        ts = datetime.fromtimestamp(self._wall_anchor + (perf_ts - self._perf_anchor))
+        if args:
+            msg = msg.format(*args)
+        return f"[{ts.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]}] {msg}"
+
+    def _drain(self):
+        """Format and write everything currently buffered."""
+        buffer = self.buffer
+        wrote = False
+        while buffer:
+            try:
+                record = buffer.popleft()
+            except IndexError:
+                break
+            line = self._format(record)
+            if self.console:
+                print(line)
+            self._file.write(line + '\n')
+            wrote = True
+        if wrote:
+            self._file.flush()
+
+    def _write_loop(self):
+        while not self._closed.wait(self.flush_interval):
+            self._drain()
+
     def save(self):
-        """Write accumulated lines to disk."""
-        with open(self.log_path, 'w', encoding='utf-8') as f:
-            for line in self.lines:
-                f.write(line + '\n')
+        """Stop the writer thread, write any remaining records and close the log file."""
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._writer.join()
+        if self.dropped:
+            self.buffer.append((time.perf_counter(), WARNING, f"Logger: ring buffer overflowed, {self.dropped} record(s) dropped", ()))
+        self._drain()
+        self._file.close()
+
+class NoteTable:
+    """Columnar note storage: parallel typed arrays instead of one dict per note.
+
+    Columns (all the same length):
+      - time: note time in seconds ('d')
+      - lane: lane number ('i')
+      - sustain: sustain length in ms ('d')
+      - type_id: index into type_names; 0 means "no special type" ('i')
+      - section: section index, -1 when the chart format has no sections ('i')
+      - must_hit: mustHitSection flag as 1/0, -1 when the format has none ('b')
+    Indexing returns a lightweight NoteView that still answers note['time'] style lookups,
+    and to_dicts() rebuilds the old list-of-dicts view for compatibility.
+    """
+    COLUMNS = (('time', 'd'), ('lane', 'i'), ('sustain', 'd'), ('type_id', 'i'), ('section', 'i'), ('must_hit', 'b'))
+
+    def __init__(self):
+        for name, typecode in self.COLUMNS:
+            setattr(self, name, array(typecode))
+        self.type_names = [0]  # type_id -> type value (0 sentinel = normal note)
+        self.type_ids = {}     # type value -> type_id (interning table)
+
+    def intern_type(self, note_type):
+        """Return the type_id for a note type, adding it to the table on first sight."""
+        if note_type == 0 or note_type is None:
+            return 0
+        type_id = self.type_ids.get(note_type)
+        if type_id is None:
+            type_id = len(self.type_names)
+            self.type_names.append(note_type)
+            self.type_ids[note_type] = type_id
+        return type_id
+
+    def extend(self, times, lanes, sustains, types, section_index=-1, must_hit=-1):
+        """Append a whole batch of notes column by column.
+
+        times/lanes/sustains/types are equal-length sequences; section_index and must_hit are
+        shared by the whole batch (one section at a time).
+        """
+        count = len(times)
+        if count == 0:
+            return
+        self.time.extend(times)
+        self.lane.extend(lanes)
+        self.sustain.extend(sustains)
+        self.type_id.extend([self.intern_type(t) for t in types])
+        self.section.extend(array('i', [section_index]) * count)
+        self.must_hit.extend(array('b', [must_hit]) * count)
+
+    def append(self, other, index=None):
+        """Append every row of another table (or just row index) in place, re-interning its types."""
+        if index is not None:
+            self.time.append(other.time[index])
+            self.lane.append(other.lane[index])
+            self.sustain.append(other.sustain[index])
+            self.type_id.append(self.intern_type(other.note_type(index)))
+            self.section.append(other.section[index])
+            self.must_hit.append(other.must_hit[index])
+            return
+        if not len(other):
+            return
+        for name in ('time', 'lane', 'sustain', 'section', 'must_hit'):
+            getattr(self, name).extend(getattr(other, name))
+        remap = [self.intern_type(t) for t in other.type_names]
+        self.type_id.extend([remap[t] for t in other.type_id])
+
+    def extend_columns(self, times, lanes, sustains, type_ids, sections, must_hits):
+        """Append ready-made column arrays (type_ids must already be interned in this table)."""
+        self.time.extend(times)
+        self.lane.extend(lanes)
+        self.sustain.extend(sustains)
+        self.type_id.extend(type_ids)
+        self.section.extend(sections)
+        self.must_hit.extend(must_hits)
+
+    def sort_by_time(self):
+        """Stable sort of every column by the time column (chronological playback order)."""
+        count = len(self.time)
+        if count < 2:
+            return
+        np = load_numpy()
+        if np is not None:
+            # Zero-copy view of the time column, then gather every column with the same order
+            order = np.argsort(np.frombuffer(self.time, dtype=np.float64), kind='stable')
+            for name, typecode in self.COLUMNS:
+                column = getattr(self, name)
+                sorted_column = array(typecode)
+                sorted_column.frombytes(np.frombuffer(column, dtype=column.typecode)[order].tobytes())
+                setattr(self, name, sorted_column)
+        else:
+            times = self.time
+            order = sorted(range(count), key=times.__getitem__)
+            for name, typecode in self.COLUMNS:
+                column = getattr(self, name)
+                setattr(self, name, array(typecode, [column[i] for i in order]))
+
+    def section_starts(self):
+        """{section index: row of its first note}, built in one pass over the section column.
+
+        On a time-sorted table that row is also the section's earliest note.
+        """
+        starts = {}
+        for row, section in enumerate(self.section):
+            if section not in starts:
+                starts[section] = row
+        return starts
+
+    def take(self, rows):
+        """New table holding the given rows, in that order (type tables are shared)."""
+        part = NoteTable()
+        for name, typecode in self.COLUMNS:
+            column = getattr(self, name)
+            setattr(part, name, array(typecode, [column[i] for i in rows]))
+        part.type_names = self.type_names
+        part.type_ids = self.type_ids
+        return part
+
+    def note_type(self, index):
+        """Return the original type value (string or 0) of the note at index."""
+        return self.type_names[self.type_id[index]]
+
+    def to_dicts(self):
+        """Old list-of-dicts representation (kept for compatibility and debugging)."""
+        return [NoteView(self, i).to_dict() for i in range(len(self.time))]
+
+    def __len__(self):
+        return len(self.time)
+
+    def __iter__(self):
+        for i in range(len(self.time)):
+            yield NoteView(self, i)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            part = NoteTable()
+            for name, _ in self.COLUMNS:
+                setattr(part, name, getattr(self, name)[index])
+            part.type_names = self.type_names
+            part.type_ids = self.type_ids
+            return part
+        if index < 0:
+            index += len(self.time)
+        if not 0 <= index < len(self.time):
+            raise IndexError('note index out of range')
+        return NoteView(self, index)
+
+class NoteView:
+    """Read-only view of one row of a NoteTable that behaves like the old note dict."""
+    __slots__ = ('table', 'index')
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    def keys(self):
+        """Keys the old dict for this note would have had (section keys only for sectioned charts)."""
+        if self.table.section[self.index] < 0:
+            return ['time', 'lane', 'type', 'sustain']
+        return ['time', 'lane', 'type', 'sustain', 'section_index', 'must_hit_section']
+
+    def __getitem__(self, key):
+        table, i = self.table, self.index
+        if key == 'time':
+            return table.time[i]
+        if key == 'lane':
+            return table.lane[i]
+        if key == 'type':
+            return table.type_names[table.type_id[i]]
+        if key == 'sustain':
+            return table.sustain[i]
+        if key == 'section_index' and table.section[i] >= 0:
+            return table.section[i]
+        if key == 'must_hit_section' and table.must_hit[i] >= 0:
+            return bool(table.must_hit[i])
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.keys()
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        return {key: self[key] for key in self.keys()}
+
+    def __repr__(self):
+        return repr(self.to_dict())
+
+# Load-time sanitizer: notes on the same lane and side with the same type that are at most
+# SANITIZE_TOLERANCE seconds apart are one stacked note pressed twice
+SANITIZE_TOLERANCE = 0.001
+SANITIZE_FIELDS = ('invalid_time', 'invalid_lane', 'fixed_sustain', 'duplicates', 'overlapped_sustains')
+
+def sanitize_notes(table, tolerance=SANITIZE_TOLERANCE):
+    """Clean a normalized note table. Returns (table, report); the table is new only if something changed.
+
+    - notes with a NaN, infinite or negative time, or a negative lane, are dropped
+    - a NaN, infinite or negative sustain becomes 0
+    - a note within tolerance of the previous note on the same lane, side (mustHitSection) and
+      type is a stacked duplicate: it is dropped and the note it stacks on keeps the longer sustain
+    - a sustain that starts and ends inside an earlier sustain on the same lane is dropped
+    Taps inside a sustain are kept; the timeline compiler ends the hold early for them. The result
+    is sorted by time. report counts each kind of change plus the notes kept.
+    """
+    count = len(table)
+    np = load_numpy()
+    if np is not None and count:
+        times = np.frombuffer(table.time, dtype=np.float64)
+        lanes = np.frombuffer(table.lane, dtype=table.lane.typecode)
+        sustains = np.frombuffer(table.sustain, dtype=np.float64)
+        type_ids = np.frombuffer(table.type_id, dtype=table.type_id.typecode)
+        must_hits = np.frombuffer(table.must_hit, dtype=table.must_hit.typecode)
+        good_time = np.isfinite(times) & (times >= 0)
+        valid = good_time & (lanes >= 0)
+        bad_sustain = valid & ~(np.isfinite(sustains) & (sustains >= 0))
+        sustains = np.where(bad_sustain, 0.0, sustains)
+        rows = np.nonzero(valid)[0]
+        # Group by (lane, side, type), in time order inside each group
+        order = rows[np.lexsort((rows, times[rows], type_ids[rows], must_hits[rows], lanes[rows]))]
+        group_start = np.ones(len(order), dtype=bool)
+        group_start[1:] = ((lanes[order][1:] != lanes[order][:-1]) | (must_hits[order][1:] != must_hits[order][:-1])
+                           | (type_ids[order][1:] != type_ids[order][:-1]))
+        grouped_times = times[order]
+        duplicate = np.zeros(len(order), dtype=bool)
+        duplicate[1:] = ~group_start[1:] & (grouped_times[1:] - grouped_times[:-1] <= tolerance)
+        grouped_sustains = sustains[order]
+        ends = grouped_times + grouped_sustains / 1000.0
+        # Latest end of any earlier note in the same group (segmented running max via per-group offsets)
+        span = (ends.max() if len(ends) else 0.0) + 1.0
+        offsets = (np.cumsum(group_start) - 1) * span
+        running = np.maximum.accumulate(ends + offsets) - offsets
+        earlier_end = np.full(len(order), -np.inf)
+        earlier_end[1:] = np.where(group_start[1:], -np.inf, running[:-1])
+        heads = ~duplicate
+        overlapped = heads & (grouped_sustains > 0) & (ends <= earlier_end)
+        report = {'invalid_time': int(np.count_nonzero(~good_time)),
+                  'invalid_lane': int(np.count_nonzero(good_time & (lanes < 0))),
+                  'fixed_sustain': int(np.count_nonzero(bad_sustain)),
+                  'duplicates': int(np.count_nonzero(duplicate)),
+                  'overlapped_sustains': int(np.count_nonzero(overlapped))}
+        if not any(report.values()):
+            report['kept'] = count
+            return table, report
+        merged = np.array(sustains)
+        if len(order):
+            merged[order[heads]] = np.maximum.reduceat(grouped_sustains, np.nonzero(heads)[0])
+        kept = order[heads & ~overlapped]
+        kept = kept[np.lexsort((kept, times[kept]))]
+        result = table.take(kept.tolist())
+        result.sustain = array('d', merged[kept].tobytes())
+    else:
+        report = dict.fromkeys(SANITIZE_FIELDS, 0)
+        times, lanes, sustains = table.time, table.lane, table.sustain
+        rows = []
+        for row in range(count):
+            t = times[row]
+            if not 0 <= t < math.inf:  # NaN fails every comparison
+                report['invalid_time'] += 1
+            elif lanes[row] < 0:
+                report['invalid_lane'] += 1
+            else:
+                rows.append(row)
+        rows.sort(key=times.__getitem__)
+        merged = {}  # kept row -> sustain after merging its duplicates
+        last = {}  # (lane, side, type) -> [previous note time, latest end so far, head row]
+        kept = []
+        type_ids, must_hits = table.type_id, table.must_hit
+        for row in rows:
+            t = times[row]
+            sustain = sustains[row]
+            if not 0 <= sustain < math.inf:
+                sustain = 0.0
+                report['fixed_sustain'] += 1
+            end = t + sustain / 1000.0
+            group = (lanes[row], must_hits[row], type_ids[row])
+            previous = last.get(group)
+            if previous is None:
+                last[group] = [t, end, row]
+            else:
+                previous_time, latest_end, head = previous
+                previous[0] = t
+                previous[1] = max(latest_end, end)
+                if t - previous_time <= tolerance:
+                    report['duplicates'] += 1
+                    merged[head] = max(merged[head], sustain)
+                    continue
+                previous[2] = row
+                if sustain > 0 and end <= latest_end:
+                    report['overlapped_sustains'] += 1
+                    merged[row] = sustain  # Its own duplicates still merge into it (and are dropped with it)
+                    continue
+            merged[row] = sustain
+            kept.append(row)
+        if not any(report.values()):
+            report['kept'] = count
+            return table, report
+        result = table.take(kept)
+        result.sustain = array('d', [merged[row] for row in kept])
+    report['kept'] = len(result)
+    return result, report
+
+def sanitize_summary(report):
+    """One-line description of a sanitize_notes() report."""
+    return (f"dropped {report['invalid_time']} invalid-time, {report['invalid_lane']} invalid-lane, "
+            f"{report['duplicates']} stacked duplicate and {report['overlapped_sustains']} overlapped sustain notes; "
+            f"{report['fixed_sustain']} sustains reset to 0; {report['kept']} notes kept")
+
+class ChartCache:
+    """On-disk cache of normalized note tables.
+
+    Entries are keyed by a hash of the chart file's contents plus the reader class and difficulty,
+    so byte-identical charts stored in different folders share one entry. Each entry is a small
+    header, the interned type names (JSON) and then the raw NoteTable columns; loading memory-maps
+    the file and points the table columns straight at the mapping (no parse, no copy).
+    Hits touch the file's mtime, which is what the size-based LRU eviction orders by.
+    """
+    MAGIC = b'FNFC'
+    VERSION = 3  # Bump whenever the normalized note layout changes (2: Dustin notes, shared section reader; 3: sanitized)
+    HEADER = struct.Struct('<4sIQI')  # magic, version, note count, type-names JSON length
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES, logger=None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.logger = logger
+        self.hits = 0
+        self.misses = 0
+
+    def _log(self, msg):
+        if self.logger:
+            self.logger.log(msg)
+
+    def key_for(self, chart_hash, reader_name, difficulty=None):
+        """Cache key: the chart's content_hash() combined with the reader class name and difficulty."""
+        return content_hash(f'{chart_hash}|{reader_name}|{difficulty}|v{self.VERSION}'.encode('utf-8'))
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key + '.notes')
+
+    def load(self, key):
+        """Return a NoteTable backed by the memory-mapped cache entry, or None on a miss."""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            self.misses += 1
+            return None
+        try:
+            magic, version, count, names_len = self.HEADER.unpack_from(mapped, 0)
+            if magic != self.MAGIC or version != self.VERSION:
+                raise ValueError('stale cache entry')
+            offset = self.HEADER.size
+            type_names = json.loads(bytes(mapped[offset:offset + names_len]).decode('utf-8'))
+            offset = _align8(offset + names_len)
+            table = NoteTable()
+            view = memoryview(mapped)
+            for name, typecode in NoteTable.COLUMNS:
+                size = count * array(typecode).itemsize
+                setattr(table, name, view[offset:offset + size].cast(typecode))
+                offset = _align8(offset + size)
+            if offset > len(mapped):
+                raise ValueError('truncated cache entry')
+        except (ValueError, struct.error) as e:
+            self._log(f"Chart cache: discarding unreadable entry {key[:12]} ({e})")
+            self.misses += 1
+            return None
+        table.type_names = type_names
+        table.type_ids = {t: i for i, t in enumerate(type_names) if i > 0}
+        table.backing = mapped  # Keep the mapping alive as long as the table is in use
+        try:
+            os.utime(path)  # Mark as recently used for LRU eviction
+        except OSError:
+            pass
+        self.hits += 1
+        return table
+
+    def store(self, key, table):
+        """Write a note table to the cache, then evict old entries if over the size budget."""
+        if not os.path.exists(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        names = json.dumps(table.type_names).encode('utf-8')
+        path = self._entry_path(key)
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self.HEADER.pack(self.MAGIC, self.VERSION, len(table), len(names)))
+            f.write(names)
+            _pad8(f)
+            for name, _ in NoteTable.COLUMNS:
+                f.write(getattr(table, name).tobytes())
+                _pad8(f)
+        os.replace(tmp_path, path)  # Atomic so a crash never leaves a half-written entry behind
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_bytes."""
+        try:
+            entries = [e for e in os.scandir(self.cache_dir) if e.name.endswith('.notes')]
+        except OSError:
+            return
+        stats = [(e.stat().st_mtime, e.stat().st_size, e.path) for e in entries]
+        total = sum(size for _, size, _ in stats)
+        for _, size, path in sorted(stats):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+                self._log(f"Chart cache: evicted {os.path.basename(path)}")
+            except OSError:
+                pass  # Entry may still be mapped by this process (Windows); try again next time
+
+def _align8(offset):
+    """Round a byte offset up to the next multiple of 8 (keeps cached columns aligned)."""
+    return (offset + 7) & ~7
+
+def _pad8(f):
+    """Pad an open binary file with zero bytes up to an 8-byte boundary."""
+    f.write(b'\0' * (_align8(f.tell()) - f.tell()))
+
+# JSON decoders, fastest first. Third-party ones are optional and imported on first use;
+# the stdlib json module is always available as the fallback.
+JSON_DECODERS = ('orjson', 'simdjson', 'json')
+_json_decoders = {}  # name -> loads(buffer), or None if the module is not installed
+
+def json_decoder(name):
+    """Return loads(buffer) for a JSON_DECODERS name, or None if its module is missing.
+
+    Each loads accepts bytes or a memoryview (see read_chart_buffer).
+    """
+    if name not in _json_decoders:
+        loads = None
+        try:
+            if name == 'orjson':
+                import orjson  # pip install orjson
+                loads = orjson.loads  # Reads memoryviews in place
+            elif name == 'simdjson':
+                import simdjson  # pip install pysimdjson
+                loads = lambda buffer: simdjson.loads(bytes(buffer))
+            elif name == 'json':
+                loads = lambda buffer: json.loads(bytes(buffer))  # bytes(b) is b itself for bytes input
+        except ImportError:
+            pass
+        _json_decoders[name] = loads
+    return _json_decoders[name]
+
+def decode_json(buffer):
+    """Parse chart JSON with the fastest installed decoder.
+
+    orjson and simdjson are strict (no NaN/Infinity literals, no BOM, 64-bit integers only),
+    so anything they reject is parsed again with the stdlib json module, which decides
+    whether the file is really invalid.
+    """
+    for name in JSON_DECODERS[:-1]:
+        loads = json_decoder(name)
+        if loads is not None:
+            try:
+                return loads(buffer)
+            except ValueError:
+                break
+    return json_decoder('json')(buffer)
+
+def read_chart_buffer(path):
+    """Return the file's contents as a read-only memoryview over a memory map.
+
+    orjson and hashlib read the mapped pages directly instead of a copy in a bytes object.
+    The other decoders need bytes anyway (copying out of a map is slower than read()), so
+    without orjson, and for files that can't be mapped (empty ones), this returns bytes.
+    """
+    with open(path, 'rb') as f:
+        if json_decoder('orjson') is None:
+            return f.read()
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return f.read()
+    return memoryview(mapped)  # Keeps the map alive; it is unmapped once the view is collected
+
+def content_hash(raw):
+    """Hex digest identifying exact file contents (shared by the chart cache and the catalog)."""
+    return hashlib.blake2b(raw, digest_size=20).hexdigest()
+
+def load_chart_cached(reader, difficulty=None, logger=None, cache=None, document=None, between_steps=None,
+                      slice_notes=0):
+    """Fill reader.notes, reading the chart file at most once.
+
+    Order: compiled chart cache (if given) -> an already parsed ChartDocument (if given, e.g.
+    from ask_user) -> a single read + parse of the file. Whatever was parsed is stored back
+    into the cache. between_steps and slice_notes split a parse into short steps (see
+    ChartDocument).
+    """
+    reader_name = type(reader).__name__
+
+    def failed(e):
+        """FNF reader has always logged read/parse errors and continued with no notes."""
+        if not isinstance(reader, FNFChartReader):
+            raise e
+        if logger:
+            logger.log(f"Error parsing FNF chart: {e}", level=ERROR)
+        else:
+            print(f"Error parsing FNF chart: {e}")
+        reader.notes = NoteTable()
+        return reader.notes
+
+    raw = None
+    if document is not None:
+        reader.document = document
+        chart_hash = document.content_hash
+    else:
+        try:
+            raw = read_chart_buffer(reader.chart_path)
+        except OSError as e:
+            return failed(e)
+        chart_hash = content_hash(raw)
+    key = None
+    if cache is not None:
+        key = cache.key_for(chart_hash, reader_name, difficulty)
+        table = cache.load(key)
+        if table is not None:
+            reader.notes = table
+            if logger:
+                logger.log(f"Chart cache hit ({reader_name}, difficulty={difficulty}, key {key[:12]}): {len(table)} notes")
+            return table
+        if logger:
+            logger.log(f"Chart cache miss ({reader_name}, difficulty={difficulty}, key {key[:12]}): "
+                       f"{'using the parsed chart' if document is not None else 'parsing JSON'}")
+    if document is None:
+        try:
+            document = ChartDocument(reader.chart_path, type(reader), raw, between_steps, slice_notes)
+        except Exception as e:
+            return failed(e)
+    reader.document = document
+    reader.notes = document.table_for(difficulty)
+    report = document.sanitize_reports.get(difficulty or ('easy' if type(reader) is FNFChartReader else None))
+    if logger and report and any(report[field] for field in SANITIZE_FIELDS):
+        logger.log(f"Sanitized chart: {sanitize_summary(report)}")
+    if cache is not None:
+        try:
+            cache.store(key, reader.notes)
+        except OSError as e:
+            if logger:
+                logger.log(f"Chart cache: could not store entry ({e})")
+    return reader.notes
+
 # Chart reader stubs
 class ChartReaderBase:
     """Abstract-ish base for chart readers to unify interface."""
     def __init__(self, chart_path):
         self.chart_path = chart_path  # Path to JSON chart
-        self.notes = []               # Normalized list of note dictionaries
+        self.notes = NoteTable()      # Normalized columnar note table
+        self.document = None          # ChartDocument the notes came from (None for cache hits)
+    def read_json(self):
+        """Parse the chart file (kept separate from normalize() so the two can be timed/shared)."""
+        return decode_json(read_chart_buffer(self.chart_path))  # Bytes in: decoding never depends on the OS locale
+    SECTIONED = False  # True for song.notes[*].sectionNotes formats (these can also be streamed)
+    def normalize(self, data):
+        """Fill self.notes from already-parsed chart JSON. Implemented by subclasses."""
+        self.notes = NoteTable()
+    def extend_section(self, table, s_idx, section):
+        """Append one song.notes section to table (sectioned formats only)."""
+        raise NotImplementedError(f"{type(self).__name__} has no sections")
     def load_chart(self):
-        """Populate self.notes. Implemented by subclasses."""
-        pass
+        """Populate self.notes (parse + normalize)."""
+        self.normalize(self.read_json())
     def get_notes(self):
-        """Return normalized list of notes."""
+        """Return the normalized note table (indexable; each row is a dict-like NoteView)."""
         return self.notes
+    def get_note_dicts(self):
+        """Return the notes as the old list of dictionaries (compatibility view)."""
+        return self.notes.to_dicts()
 
 class FNFChartReader(ChartReaderBase):
     """Reader for base-game FNF charts (simplified custom JSON format)."""
+    def normalize(self, data, difficulty=None):
+        self.notes = NoteTable()
+        if difficulty is None:
+            difficulty = 'easy'  # Default fallback
+        notes_list = data.get('notes', {}).get(difficulty, [])
+        # Expected structure: {"t": milliseconds, "d": lane, "l": sustainMs, ...}
+        # Columns are built in bulk; no note types (string) in this format, so 0 sentinel
+        self.notes.extend(
+            [note.get('t', 0) / 1000.0 for note in notes_list],  # Convert ms -> seconds for runtime scheduling
+            [note.get('d', 0) for note in notes_list],
+            [note.get('l', 0) for note in notes_list],
+            [0] * len(notes_list)
+        )
     def load_chart(self, difficulty=None, logger=None):
         try:
-            with open(self.chart_path, 'r') as f:
-                data = json.load(f)
-            self.notes = []
-            if difficulty is None:
-                difficulty = 'easy'  # Default fallback
-            notes_list = data.get('notes', {}).get(difficulty, [])
-            for note in notes_list:
-                # Expected structure: {"t": milliseconds, "d": lane, "l": sustainMs, ...}
-                time_pos = note.get('t', 0) / 1000.0  # Convert ms -> seconds for runtime scheduling
-                lane = note.get('d', 0)
-                sustain = note.get('l', 0)
-                note_type = 0  # No note types (string) in this format; using 0 sentinel
-                self.notes.append({
-                    'time': time_pos,
-                    'lane': lane,
-                    'type': note_type,
-                    'sustain': sustain
-                })
+            self.normalize(self.read_json(), difficulty)
         except Exception as e:
             # Log via provided logger if available else print
             if logger:
-                logger.log(f"Error parsing FNF chart: {e}")
+                logger.log(f"Error parsing FNF chart: {e}", level=ERROR)
             else:
                 print(f"Error parsing FNF chart: {e}")
 
-class MattChartReader(ChartReaderBase):
-    """Reader for 'Matt' style charts where data is grouped into sections with mustHitSection flags."""
-    def load_chart(self):
-        with open(self.chart_path, 'r') as f:
-            data = json.load(f)
-        self.notes = []
+class SectionChartReader(ChartReaderBase):
+    """Shared engine for sectioned charts: song.notes[*].sectionNotes (Matt, Doors, Dustin).
+
+    Each section is a dict with 'sectionNotes' and 'mustHitSection' (plus BPM data that is
+    ignored). Observed note entries:
+      [timeMs, lane]                                     (rare, sustain 0)
+      [timeMs, lane, sustainMs]
+      [timeMs, lane, sustainMs, type]                    (type: string, "" or null; Dustin: int)
+      [timeMs, lane, sustainMs, type, extra]             (extra: [] in Doors, beat number in Dustin)
+    Entries that are not lists of at least two values are dropped. The section list is
+    song.notes; song.sections is used instead only when it is a list (Dustin stores a count there).
+
+    All sections are flattened first and every column is then built in one pass over all notes.
+    Values of an unexpected kind (a string time, a null sustain, a float lane) send that batch
+    through a slower checked path, where they become 0.
+    """
+    SECTIONED = True
+
+    @staticmethod
+    def type_name(value):
+        """Note type for a raw 4th element; 0 = normal note ("" and null included)."""
+        return value if isinstance(value, str) and value else 0
+
+    @staticmethod
+    def song_sections(data):
         song_data = data.get('song', {})  # Root song object
-        sections = song_data.get('notes', [])  # Array of section dictionaries
-        # Iterate each section, capture index and mustHitSection, then expand raw notes
-        for s_idx, section in enumerate(sections):
-            if isinstance(section, dict) and 'sectionNotes' in section:
-                must_hit = section.get('mustHitSection', False)
-                for raw in section.get('sectionNotes', []):
-                    # raw forms: [timeMs, lane, sustainMs] OR [timeMs, lane, sustainMs, stringType]
-                    time_pos = raw[0] / 1000.0 if len(raw) > 0 else 0.0
-                    lane = raw[1] if len(raw) > 1 else 0
-                    sustain = raw[2] if len(raw) > 2 and isinstance(raw[2], (int, float)) else 0
-                    note_type = raw[3] if len(raw) > 3 and isinstance(raw[3], str) else 0
-                    self.notes.append({
-                        'time': time_pos,
-                        'lane': lane,
-                        'type': note_type,
-                        'sustain': sustain,
-                        'section_index': s_idx,
-                        'must_hit_section': must_hit
-                    })
+        sections = song_data.get('notes')
+        if not isinstance(sections, list):
+            sections = song_data.get('sections')
+        return sections if isinstance(sections, list) else []
+
+    def extend_sections(self, table, sections, first_index=0):
+        """Append the notes of consecutive sections (numbered from first_index) to table."""
+        raws = []
+        section_ids = array('i')
+        must_hits = array('b')
+        for s_idx, section in enumerate(sections, first_index):
+            if not isinstance(section, dict) or not isinstance(section.get('sectionNotes'), list):
+                continue
+            notes = [raw for raw in section['sectionNotes'] if isinstance(raw, list) and len(raw) >= 2]
+            if notes:
+                raws.extend(notes)
+                section_ids.extend(array('i', [s_idx]) * len(notes))
+                must_hits.extend(array('b', [1 if section.get('mustHitSection', False) else 0]) * len(notes))
+        if not raws:
+            return
+        try:
+            # Fast path: typed arrays reject anything that is not a plain number
+            times = array('d', [raw[0] for raw in raws])
+            lanes = array('i', [raw[1] for raw in raws])
+            sustains = array('d', [raw[2] if len(raw) > 2 else 0 for raw in raws])
+        except (TypeError, OverflowError):
+            times = array('d', [raw[0] if isinstance(raw[0], (int, float)) else 0.0 for raw in raws])
+            lanes = array('i', [int(raw[1]) if isinstance(raw[1], (int, float)) else 0 for raw in raws])
+            sustains = array('d', [raw[2] if len(raw) > 2 and isinstance(raw[2], (int, float)) else 0 for raw in raws])
+        np = load_numpy()
+        if np is not None:
+            times = array('d', (np.frombuffer(times, dtype=np.float64) / 1000.0).tobytes())  # ms -> seconds
+        else:
+            times = array('d', [t / 1000.0 for t in times])
+        values = [raw[3] if len(raw) > 3 and isinstance(raw[3], (str, int)) else 0 for raw in raws]
+        # Intern each distinct raw value once (first-seen order), then map the whole column
+        ids = {value: table.intern_type(self.type_name(value)) for value in dict.fromkeys(values)}
+        table.extend_columns(times, lanes, sustains, array('i', map(ids.__getitem__, values)), section_ids, must_hits)
+
+    def extend_section(self, table, s_idx, section):
+        self.extend_sections(table, (section,), s_idx)
+
+    def normalize(self, data, between_steps=None, slice_notes=0):
+        """Fill self.notes from parsed JSON. With between_steps, sections are added about
+        slice_notes notes at a time and between_steps() is called after each batch."""
+        self.notes = NoteTable()
+        sections = self.song_sections(data)
+        if between_steps is None:
+            self.extend_sections(self.notes, sections)
+        else:
+            first = count = 0
+            for s_idx, section in enumerate(sections):
+                notes = section.get('sectionNotes') if isinstance(section, dict) else None
+                count += len(notes) if isinstance(notes, list) else 0
+                if count >= slice_notes:
+                    self.extend_sections(self.notes, sections[first:s_idx + 1], first)
+                    between_steps()
+                    first, count = s_idx + 1, 0
+            self.extend_sections(self.notes, sections[first:], first)
         # Sort notes to ensure chronological playback (some charts may list sections out of pure order)
-        self.notes.sort(key=lambda n: n['time'])
+        self.notes.sort_by_time()
 
-class DustinChartReader(ChartReaderBase):
-    """Placeholder reader for 'Dustin' format (parsing to be implemented)."""
-    def load_chart(self):
-        with open(self.chart_path, 'r') as f:
-            data = json.load(f)
-        # TODO: Implement extraction similar to Matt/FNF by analyzing format
-        self.notes = []
-
-class DoorsChartReader(ChartReaderBase):
-    """Reader for 'Doors' format charts.
-
-    Observed format (similar to Matt): JSON root has key 'song' with nested array 'notes'. Each
-    element (section) is a dict containing:
-      - 'sectionNotes': array of note entries
-      - 'mustHitSection': bool indicating which side the player is on for this section
-      - optional BPM change data
-
-    A note entry appears in several forms based on samples:
-      [timeMs, lane, sustainMs, typeString]
-      [timeMs, lane, sustainMs, typeString, extraDataArray]
-      [timeMs, lane, sustainMs] (type omitted)
-      [timeMs, lane] (rare, treat sustain=0)
-
-    Some entries include a trailing empty string ("") for type; treat empty string as no special type (0 sentinel).
-    We'll normalize each to a dict with keys: time (seconds), lane, sustain (ms), type (string or 0),
-    section_index, must_hit_section.
+class MattChartReader(SectionChartReader):
+    """Reader for 'Matt' style charts where data is grouped into sections with mustHitSection flags.
+
+    Notes are [timeMs, lane, sustainMs] or [timeMs, lane, sustainMs, stringType] (type may be null).
+    """
+
+class DustinChartReader(SectionChartReader):
+    """Reader for 'Dustin' charts (Kade-style sections).
+
+    Notes are [timeMs, lane, sustainMs], [timeMs, lane, sustainMs, intType] or
+    [timeMs, lane, sustainMs, intType, beat]. Type 0 is a normal note; other numbers are
+    reported as special types named 'type <n>' so presets can decide whether to hit them.
+    song.sections holds a section count, not the sections.
+    """
+    @staticmethod
+    def type_name(value):
+        if isinstance(value, int) and not isinstance(value, bool):
+            return f'type {value}' if value else 0
+        return SectionChartReader.type_name(value)
+
+class DoorsChartReader(SectionChartReader):
+    """Reader for 'Doors' format charts (same section layout as Matt).
+
+    Types are usually an empty string (no special type); some notes carry a fifth element
+    (often []) that is ignored.
     """
-    def load_chart(self):
-        with open(self.chart_path, 'r') as f:
-            data = json.load(f)
-        self.notes = []
-        song_data = data.get('song', {})
-        sections = song_data.get('notes', [])
-        for s_idx, section in enumerate(sections):
-            if isinstance(section, dict) and 'sectionNotes' in section:
-                must_hit = section.get('mustHitSection', False)
-                for raw in section.get('sectionNotes', []):
-                    # raw could have extra trailing data (like an array). We'll safely extract.
-                    if not isinstance(raw, list) or len(raw) < 2:
-                        continue
-                    time_ms = raw[0]
-                    lane = raw[1]
-                    sustain = 0
-                    note_type = 0
-                    if len(raw) >= 3 and isinstance(raw[2], (int, float)):
-                        sustain = raw[2]
-                    # 4th element may be type string OR empty string.
-                    if len(raw) >= 4 and isinstance(raw[3], str) and raw[3] != "":
-                        note_type = raw[3]
-                    # Fifth element (if present) is ignored (often []) in samples.
-                    self.notes.append({
-                        'time': (time_ms / 1000.0) if isinstance(time_ms, (int, float)) else 0.0,
-                        'lane': lane if isinstance(lane, (int, float)) else 0,
-                        'type': note_type,
-                        'sustain': sustain if isinstance(sustain, (int, float)) else 0,
-                        'section_index': s_idx,
-                        'must_hit_section': must_hit
-                    })
-        self.notes.sort(key=lambda n: n['time'])
+
+class ChartDocument:
+    """A chart file parsed exactly once, shared by ask_user, the reader and the chart cache.
+
+    The same pass that parses the JSON also normalizes and sanitizes the notes (every
+    difficulty for base-game charts), so the difficulty list and the special note types fall
+    out of it without walking the JSON again. With between_steps the work is split into short
+    steps (decode; normalize about slice_notes notes; sanitize, per difficulty) and
+    between_steps() is called between them, like compile_timeline() does.
+    """
+    def __init__(self, path, reader_class, raw=None, between_steps=None, slice_notes=0):
+        if raw is None:
+            raw = read_chart_buffer(path)
+        step = between_steps or (lambda: None)
+        self.path = path
+        self.reader_class = reader_class
+        self.content_hash = content_hash(raw)
+        self.data = decode_json(raw)
+        step()
+        self.tables = {}  # difficulty (None for single-difficulty formats) -> NoteTable
+        self.sanitize_reports = {}  # difficulty -> sanitize_notes() report
+        reader = reader_class(path)
+        if reader_class is FNFChartReader:
+            self.difficulties = list(self.data.get('notes', {}).keys())
+            for difficulty in self.difficulties:
+                reader.normalize(self.data, difficulty)
+                step()
+                self.tables[difficulty], self.sanitize_reports[difficulty] = sanitize_notes(reader.notes)
+                step()
+        else:
+            self.difficulties = []
+            reader.normalize(self.data, between_steps, slice_notes)
+            step()
+            self.tables[None], self.sanitize_reports[None] = sanitize_notes(reader.notes)
+        self.special_types = set()
+        for table in self.tables.values():
+            self.special_types.update(table.type_names[1:])
+
+    def table_for(self, difficulty=None):
+        """Normalized notes for a difficulty (same 'easy' fallback as FNFChartReader)."""
+        if self.reader_class is FNFChartReader:
+            return self.tables.get(difficulty or 'easy') or NoteTable()
+        return self.tables[None]
 
 chart_types = {
     # user option -> (human label, reader class)
@@ -211,6 +948,529 @@ chart_types = {
     '3': ('Dustin', DustinChartReader),
     '4': ('Doors', DoorsChartReader)
 }
+# --type names: 'fnf', 'matt', 'dustin', 'doors' (plus 'auto')
+CHART_TYPE_NAMES = {v[1].__name__[:-len('ChartReader')].lower(): v[1] for v in chart_types.values()}
+
+def note_shape_reader(raw):
+    """Reader implied by a single sectionNotes entry, or None if it looks like any Matt note."""
+    if not isinstance(raw, list) or len(raw) <= 3:
+        return None
+    if raw[3] == '' or (len(raw) > 4 and isinstance(raw[4], list)):
+        return DoorsChartReader  # Empty-string types / trailing [] extra data
+    if isinstance(raw[3], int) and not isinstance(raw[3], bool):
+        return DustinChartReader  # Numeric note types
+    return None
+
+def detect_chart_format(data):
+    """Classify parsed chart JSON. Returns (format name, reader class or None).
+
+    Formats: 'fnf_v2' (base game, notes keyed by difficulty), 'sections' (song.notes[*].sectionNotes;
+    the reader is guessed from the note shape), 'metadata', 'events', 'modchart' or 'unknown'.
+    """
+    if not isinstance(data, dict):
+        return 'unknown', None
+    if isinstance(data.get('notes'), dict):
+        return 'fnf_v2', FNFChartReader
+    song = data.get('song')
+    if isinstance(song, dict) and isinstance(song.get('notes'), list):
+        for section in song['notes']:
+            for raw in (section.get('sectionNotes') or []) if isinstance(section, dict) else []:
+                reader_class = note_shape_reader(raw)
+                if reader_class is not None:
+                    return 'sections', reader_class
+        return 'sections', MattChartReader
+    if (isinstance(song, dict) and 'events' in song) or ('events' in data and 'notes' not in data):
+        return 'events', None
+    if 'playData' in data or 'difficulties' in data:
+        return 'metadata', None
+    if 'modifiers' in data:
+        return 'modchart', None
+    return 'unknown', None
+
+SNIFF_PREFIX_BYTES = 64 * 1024  # First read of a chart when sniffing; doubled only if undecided
+SNIFF_MAX_NOTES = 512  # Notes inspected before a sectioned chart is taken to be Matt
+
+ChartSniff = namedtuple('ChartSniff', 'format reader difficulties')
+
+class _SniffNeedMore(Exception):
+    """The prefix ended before the chart format could be decided."""
+
+class _PrefixScanner:
+    """Walks a (possibly truncated) JSON text, descending only where the sniffer asks to.
+
+    Values the sniffer does not care about are skipped whole with the C decoder, so large
+    event lists or note arrays cost almost nothing. Running off the end of the prefix raises
+    _SniffNeedMore instead of guessing.
+    """
+    _WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+    def __init__(self, text, complete):
+        self.text = text
+        self.complete = complete  # True when text is the whole file
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+
+    def peek(self):
+        self.pos = self._WHITESPACE.match(self.text, self.pos).end()
+        if self.pos >= len(self.text):
+            if self.complete:
+                raise ValueError("Unexpected end of JSON")
+            raise _SniffNeedMore()
+        return self.text[self.pos]
+
+    def take(self, allowed):
+        ch = self.peek()
+        if ch not in allowed:
+            raise ValueError(f"Unexpected {ch!r} at offset {self.pos}")
+        self.pos += 1
+        return ch
+
+    def value(self):
+        self.peek()
+        try:
+            value, self.pos = self.decoder.raw_decode(self.text, self.pos)
+        except json.JSONDecodeError:
+            if self.complete:
+                raise
+            raise _SniffNeedMore()
+        if self.pos >= len(self.text) and not self.complete:
+            raise _SniffNeedMore()  # A number cut off by the prefix would decode as a shorter one
+        return value
+
+    def members(self):
+        """Yield the keys of the object at pos; the caller must consume each value."""
+        self.take('{')
+        if self.peek() == '}':
+            self.pos += 1
+            return
+        while True:
+            key = self.value()
+            self.take(':')
+            yield key
+            if self.take(',}') == '}':
+                return
+
+    def items(self):
+        """Yield once per element of the array at pos; the caller must consume each element."""
+        self.take('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield
+            if self.take(',]') == ']':
+                return
+
+def metadata_difficulties(chart_path):
+    """Playable difficulties from a base-game chart's sibling metadata file, or None.
+
+    'stress-chart.json' pairs with 'stress-metadata.json' and 'stress-chart-erect.json' with
+    'stress-metadata-erect.json'. The metadata lists the difficulties in menu order and leaves
+    out unused leftovers that some charts still carry in their notes.
+    """
+    folder, name = os.path.split(chart_path)
+    cut = name.rfind('-chart')
+    if cut < 0:
+        return None
+    metadata_path = os.path.join(folder, name[:cut] + '-metadata' + name[cut + len('-chart'):])
+    try:
+        with open(metadata_path, 'rb') as f:
+            difficulties = json.loads(f.read()).get('playData', {}).get('difficulties')
+    except (OSError, ValueError, AttributeError):
+        return None
+    return list(difficulties) if isinstance(difficulties, list) else None
+
+def chart_offset_ms(chart_path):
+    """Song offset in ms from a '<ms>.offset' file next to the chart, or 0.0.
+
+    Kade Engine convention (the Dustin folders ship '0.offset'): the value is the file name,
+    the file itself is empty, and the game adds it to every note time.
+    """
+    try:
+        names = sorted(os.listdir(os.path.dirname(chart_path) or '.'))
+    except OSError:
+        return 0.0
+    for name in names:
+        if name.endswith('.offset'):
+            try:
+                return float(name[:-len('.offset')])
+            except ValueError:
+                continue
+    return 0.0
+
+def _sniff_sections(scanner, max_notes):
+    """Reader for a song.notes section list, from the shape of its first notes."""
+    inspected = 0
+    for _ in scanner.items():
+        section = scanner.value()  # Sections are small; decoding one whole is cheaper than walking it
+        for raw in (section.get('sectionNotes') or []) if isinstance(section, dict) else []:
+            reader_class = note_shape_reader(raw)
+            if reader_class is not None:
+                return reader_class
+            inspected += 1
+        if inspected >= max_notes:
+            return MattChartReader
+    return MattChartReader
+
+def _sniff_text(scanner, chart_path, max_notes):
+    """Same classification as detect_chart_format(), stopping as soon as the answer is known."""
+    if scanner.peek() != '{':
+        scanner.value()
+        return ChartSniff('unknown', None, [])
+    keys = set()
+    song_keys = None
+    for key in scanner.members():
+        keys.add(key)
+        if key == 'notes' and scanner.peek() == '{':
+            difficulties = metadata_difficulties(chart_path)
+            if difficulties is None:
+                difficulties = []
+                for difficulty in scanner.members():  # No metadata: fall back to the notes keys
+                    difficulties.append(difficulty)
+                    scanner.value()
+            return ChartSniff('fnf_v2', FNFChartReader, difficulties)
+        if key == 'song' and scanner.peek() == '{':
+            song_keys = set()
+            for song_key in scanner.members():
+                song_keys.add(song_key)
+                if song_key == 'notes' and scanner.peek() == '[':
+                    return ChartSniff('sections', _sniff_sections(scanner, max_notes), [])
+                scanner.value()
+            continue
+        scanner.value()
+    if (song_keys is not None and 'events' in song_keys) or ('events' in keys and 'notes' not in keys):
+        return ChartSniff('events', None, [])
+    if 'playData' in keys or 'difficulties' in keys:
+        return ChartSniff('metadata', None, [])
+    if 'modifiers' in keys:
+        return ChartSniff('modchart', None, [])
+    return ChartSniff('unknown', None, [])
+
+def sniff_chart_file(chart_path, prefix_bytes=SNIFF_PREFIX_BYTES, max_notes=SNIFF_MAX_NOTES):
+    """Detect a chart's format, reader and (base game) difficulties without parsing the whole file.
+
+    Reads a bounded prefix and retries with twice as much only when that prefix ended before
+    the answer was known (e.g. a huge events list ahead of the notes). Raises ValueError for
+    files that are not valid JSON.
+    """
+    size = os.path.getsize(chart_path)
+    with open(chart_path, 'rb') as f:
+        data = b''
+        while True:
+            data += f.read(max(prefix_bytes - len(data), 0))
+            complete = len(data) >= size
+            # errors='ignore' only ever drops a multi-byte character split by the prefix cut
+            text = data.decode('utf-8-sig', errors='strict' if complete else 'ignore')
+            try:
+                return _sniff_text(_PrefixScanner(text, complete), chart_path, max_notes)
+            except _SniffNeedMore:
+                if complete:
+                    raise ValueError("Unexpected end of JSON")
+                prefix_bytes *= 2
+
+# Streaming mode ("stream": true in a preset): sections are parsed while playback runs
+STREAM_CHUNK_BYTES = 64 * 1024  # File read size while streaming
+STREAM_WINDOW_SECTIONS = 4  # Sections buffered before notes are released in time order
+STREAM_LOOKAHEAD = 2.0  # Seconds of compiled actions kept queued ahead of playback
+
+class _ChunkedText:
+    """Decoded text of a file read chunk by chunk (multi-byte characters may span chunks)."""
+    def __init__(self, f, chunk_bytes):
+        self.f = f
+        self.chunk_bytes = chunk_bytes
+        self.decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self.text = ''
+        self.eof = False
+
+    def read_more(self, size=None):
+        data = self.f.read(size or self.chunk_bytes)
+        self.eof = not data
+        self.text += self.decoder.decode(data, final=self.eof)
+
+def _seek_song_notes(scanner):
+    """Advance scanner to the '[' of song.notes. Returns False if the file has no such list."""
+    if scanner.peek() != '{':
+        return False
+    for key in scanner.members():
+        if key == 'song' and scanner.peek() == '{':
+            for song_key in scanner.members():
+                if song_key in ('notes', 'sections') and scanner.peek() == '[':
+                    return True
+                scanner.value()
+            continue
+        scanner.value()
+    return False
+
+def iter_chart_sections(chart_path, chunk_bytes=STREAM_CHUNK_BYTES):
+    """Yield (section index, section) for each entry of song.notes (or a song.sections list),
+    reading the file in chunks.
+
+    Only one section (plus one chunk of text) is held at a time; sections are decoded whole by
+    the C decoder. Keys ahead of song.notes (e.g. a long events list) are skipped the same way
+    the format sniffer skips them.
+    """
+    with open(chart_path, 'rb') as f:
+        chunks = _ChunkedText(f, chunk_bytes)
+        chunks.read_more()
+        while True:
+            scanner = _PrefixScanner(chunks.text, chunks.eof)
+            try:
+                if not _seek_song_notes(scanner):
+                    return
+                break
+            except _SniffNeedMore:
+                chunks.read_more(max(chunk_bytes, len(chunks.text)))  # Double what is buffered
+        text, pos = chunks.text, scanner.pos + 1
+        decoder = scanner.decoder
+        whitespace = _PrefixScanner._WHITESPACE
+        s_idx = 0
+        while True:
+            pos = whitespace.match(text, pos).end()
+            end = None
+            if pos < len(text):
+                ch = text[pos]
+                if ch == ']':
+                    return
+                if ch == ',':
+                    pos += 1
+                    continue
+                try:
+                    section, end = decoder.raw_decode(text, pos)
+                except json.JSONDecodeError:
+                    if chunks.eof:
+                        raise
+            elif chunks.eof:
+                raise ValueError("Unexpected end of JSON in song.notes")
+            if end is None or (end >= len(text) and not chunks.eof):
+                # Section cut off by the chunk boundary: keep only the unread tail and read on
+                chunks.text = text[pos:]
+                chunks.read_more()
+                text, pos = chunks.text, 0
+                continue
+            yield s_idx, section
+            s_idx += 1
+            pos = end
+
+def stream_chart_notes(reader, window_sections=STREAM_WINDOW_SECTIONS, chunk_bytes=STREAM_CHUNK_BYTES, stats=None):
+    """Yield time-sorted NoteTable batches of a sectioned chart while it is still being read.
+
+    Each section becomes a small sorted run; runs are k-way merged through a heap. Sections are
+    nearly in time order, so once window_sections more sections have been read, every note
+    earlier than the earliest of those sections is final and is released as a batch. The
+    order matches a full load + stable sort. A note that shows up behind notes already released
+    (a section far out of order) is released at once and counted in stats['late_notes'].
+    """
+    if stats is None:
+        stats = {}
+    stats.update(sections=0, late_notes=0, peak_buffered=0)
+    heap = []  # (time, section order, row, run): one cursor per section run
+    recent_starts = deque(maxlen=window_sections)
+    released_until = float('-inf')
+    buffered = 0
+
+    def release(until):
+        nonlocal released_until, buffered
+        batch = NoteTable()
+        while heap and heap[0][0] < until:
+            note_time, order, row, run = heapq.heappop(heap)
+            if note_time < released_until:
+                stats['late_notes'] += 1
+            else:
+                released_until = note_time
+            batch.append(run, row)
+            buffered -= 1
+            if row + 1 < len(run):
+                heapq.heappush(heap, (run.time[row + 1], order, row + 1, run))
+        return batch
+
+    for s_idx, section in iter_chart_sections(reader.chart_path, chunk_bytes):
+        stats['sections'] += 1
+        run = NoteTable()
+        reader.extend_section(run, s_idx, section)
+        if not len(run):
+            continue
+        run.sort_by_time()
+        heapq.heappush(heap, (run.time[0], s_idx, 0, run))
+        buffered += len(run)
+        stats['peak_buffered'] = max(stats['peak_buffered'], buffered)
+        recent_starts.append(run.time[0])
+        if len(recent_starts) == window_sections:
+            batch = release(min(recent_starts))
+            if len(batch):
+                yield batch
+    batch = release(float('inf'))
+    if len(batch):
+        yield batch
+
+def count_note_sides(table, key_count=4):
+    """Return (player notes, opponent notes) using the usual lane layout (0..key_count-1 = player)
+    and, for sectioned charts, the mustHitSection swap."""
+    player = 0
+    for lane, must_hit in zip(table.lane, table.must_hit):
+        own_side = lane < key_count
+        if must_hit >= 0 and not must_hit:
+            own_side = not own_side
+        player += own_side
+    return player, len(table) - player
+
+def index_chart_file(path):
+    """Build the catalog record for one JSON file (runs in a worker process)."""
+    stat = os.stat(path)
+    raw = read_chart_buffer(path)
+    record = {'path': path, 'mtime': stat.st_mtime, 'size': stat.st_size,
+              'hash': content_hash(raw), 'format': 'unknown', 'reader': None,
+              'difficulties': [], 'note_counts': {}, 'special_types': [], 'duration': 0.0, 'error': None}
+    try:
+        data = decode_json(raw)
+        record['format'], reader_class = detect_chart_format(data)
+        if reader_class is None:
+            return record
+        record['reader'] = reader_class.__name__
+        reader = reader_class(path)
+        difficulties = list(data['notes']) if reader_class is FNFChartReader else [None]
+        record['difficulties'] = [d for d in difficulties if d is not None]
+        special_types = set()
+        for difficulty in difficulties:
+            if reader_class is FNFChartReader:
+                reader.normalize(data, difficulty)
+            else:
+                reader.normalize(data)
+            table, _ = sanitize_notes(reader.get_notes())
+            player, opponent = count_note_sides(table)
+            record['note_counts'][difficulty or 'default'] = {'player': player, 'opponent': opponent}
+            special_types.update(t for t in table.type_names[1:])
+            if len(table):
+                end = max(t + s / 1000.0 for t, s in zip(table.time, table.sustain))
+                record['duration'] = max(record['duration'], end)
+        record['special_types'] = sorted(special_types, key=str)
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+    return record
+
+class ChartCatalog:
+    """SQLite catalog of chart files: detected format, difficulties, note counts per side,
+    special note types, duration and content hash. Updated incrementally by mtime."""
+    SCHEMA = (
+        "CREATE TABLE IF NOT EXISTS charts ("
+        " path TEXT PRIMARY KEY, mtime REAL, size INTEGER, hash TEXT, format TEXT, reader TEXT,"
+        " difficulties TEXT, note_counts TEXT, special_types TEXT, duration REAL, error TEXT)"
+    )
+    JSON_FIELDS = ('difficulties', 'note_counts', 'special_types')
+    VERSION = 2  # Stored as PRAGMA user_version; bumping it drops stale rows (2: Dustin charts are read)
+
+    def __init__(self, path=CATALOG_PATH):
+        self.path = path
+        self._conn = None
+
+    def _connect(self):
+        if self._conn is None:
+            import sqlite3  # Only the catalog commands need it; keeps it off the launch path
+            self._conn = sqlite3.connect(self.path)
+            self._conn.row_factory = sqlite3.Row
+            self._conn.execute(self.SCHEMA)
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] != self.VERSION:
+                # Rows written by an older reader are stale; the next --index rebuilds them
+                with self._conn:
+                    self._conn.execute("DELETE FROM charts")
+                    self._conn.execute(f"PRAGMA user_version = {self.VERSION}")
+        return self._conn
+
+    def _row(self, row):
+        record = dict(row)
+        for field in self.JSON_FIELDS:
+            record[field] = json.loads(record[field] or 'null')
+        return record
+
+    def count(self):
+        """Number of indexed chart files (0 if the catalog was never built; does not create it)."""
+        if self._conn is None and not os.path.isfile(self.path):
+            return 0
+        return self._connect().execute("SELECT COUNT(*) FROM charts WHERE reader IS NOT NULL").fetchone()[0]
+
+    def update(self, roots, workers=None, logger=None):
+        """Index every .json under roots with a process pool, skipping files whose mtime/size
+        are unchanged and dropping rows for files that disappeared. Returns (indexed, unchanged, removed)."""
+        from concurrent.futures import ProcessPoolExecutor
+        conn = self._connect()
+        known = {row['path']: (row['mtime'], row['size']) for row in conn.execute("SELECT path, mtime, size FROM charts")}
+        seen = set()
+        todo = []
+        for root in roots:
+            root = os.path.abspath(root)
+            for dirpath, _, filenames in os.walk(root):
+                for name in filenames:
+                    if not name.lower().endswith('.json'):
+                        continue
+                    path = os.path.join(dirpath, name)
+                    seen.add(path)
+                    stat = os.stat(path)
+                    if known.get(path) != (stat.st_mtime, stat.st_size):
+                        todo.append(path)
+        records = []
+        if todo:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                records = list(pool.map(index_chart_file, todo, chunksize=8))
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO charts VALUES (:path, :mtime, :size, :hash, :format, :reader,"
+                " :difficulties, :note_counts, :special_types, :duration, :error)",
+                [dict(r, **{f: json.dumps(r[f]) for f in self.JSON_FIELDS}) for r in records])
+            removed = [p for p in known if p not in seen and any(p.startswith(os.path.abspath(r) + os.sep) for r in roots)]
+            conn.executemany("DELETE FROM charts WHERE path = ?", [(p,) for p in removed])
+        unchanged = len(seen) - len(todo)
+        if logger:
+            logger.log(f"Chart catalog: indexed {len(todo)}, unchanged {unchanged}, removed {len(removed)}")
+        return len(todo), unchanged, len(removed)
+
+    def search(self, text='', limit=30):
+        """Playable charts whose path contains text (case-insensitive)."""
+        rows = self._connect().execute(
+            "SELECT * FROM charts WHERE reader IS NOT NULL AND path LIKE ? ORDER BY path LIMIT ?",
+            (f"%{text}%", limit))
+        return [self._row(row) for row in rows]
+
+    def lookup(self, path):
+        """Catalog record for path if it is indexed and still up to date, else None."""
+        if not self.count():
+            return None
+        path = os.path.abspath(path)
+        row = self._connect().execute("SELECT * FROM charts WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return None
+        stat = os.stat(path)
+        if (row['mtime'], row['size']) != (stat.st_mtime, stat.st_size):
+            return None
+        return self._row(row)
+
+def pick_from_catalog(catalog, logger):
+    """Let the user search the catalog and pick a chart. Returns the record or None to type a path."""
+    query = input("Search the chart catalog (part of a name, or Enter to type a path instead): ").strip()
+    while query:
+        rows = catalog.search(query)
+        if not rows:
+            print("No matching charts.")
+        for i, row in enumerate(rows):
+            counts = ', '.join(f"{d}: {c['player']}/{c['opponent']}" for d, c in row['note_counts'].items())
+            print(f"{i+1}: {row['path']} [{row['reader']}] notes player/opponent {counts}, {row['duration']:.0f}s")
+        if rows:
+            sel = input("Select a chart by number, or 0 to search again: ").strip()
+            if sel.isdigit() and 0 < int(sel) <= len(rows):
+                logger.log(f"Chart picked from catalog: {rows[int(sel)-1]['path']}")
+                return rows[int(sel)-1]
+        query = input("Search the chart catalog (or Enter to type a path instead): ").strip()
+    return None
+
+def settings_from_preset(preset_data):
+    """Turn loaded preset JSON back into settings (reader class object, int lane keys)."""
+    # Convert chart_class string to actual class object
+    chart_class_name = preset_data.get('chart_class')
+    for k, v in chart_types.items():
+        if v[1].__name__ == chart_class_name:
+            preset_data['chart_class'] = v[1]
+            break
+    # Convert controls keys to int (they may be str if loaded from JSON)
+    preset_data['controls'] = {int(k): v for k, v in preset_data['controls'].items()}
+    return preset_data
 
 def ask_user(logger):
     """Interactive prompt sequence to gather configuration (or load a preset)."""
@@ -225,36 +1485,76 @@ def ask_user(logger):
         if sel.isdigit() and int(sel) > 0 and int(sel) <= len(presets):
             preset_data = load_preset(presets[int(sel)-1])
             logger.log(f"Loaded preset: {preset_data}")
-            # Convert chart_class string to actual class object
-            chart_class_name = preset_data.get('chart_class')
-            for k, v in chart_types.items():
-                if v[1].__name__ == chart_class_name:
-                    preset_data['chart_class'] = v[1]
-                    break
-            # Convert controls keys to int (they may be str if loaded from JSON)
-            preset_data['controls'] = {int(k): v for k, v in preset_data['controls'].items()}
-            return preset_data
-
-    # Choose chart reader type
-    print("Select FNF chart type:")
-    for k, v in chart_types.items():
-        print(f"{k}: {v[0]}")
-    chart_type = input("Enter chart type number: ").strip()
-    while chart_type not in chart_types:
-        logger.log(f"Invalid chart type entered: {chart_type}")
-        chart_type = input("Invalid. Enter chart type number: ").strip()
-    chart_class = chart_types[chart_type][1]
-
-    chart_file = input("Enter chart file name or path: ").strip()
-    while not os.path.isfile(chart_file):
-        logger.log(f"Chart file not found: {chart_file}")
-        chart_file = input("File not found. Enter chart file name or path: ").strip()
+            return settings_from_preset(preset_data)
+
+    # Pick from the chart catalog (built with --index) when there is one; no JSON needs loading then
+    catalog = ChartCatalog()
+    catalog_row = pick_from_catalog(catalog, logger) if catalog.count() else None
+    if catalog_row is not None:
+        chart_file = catalog_row['path']
+        chart_class = next(v[1] for v in chart_types.values() if v[1].__name__ == catalog_row['reader'])
+    else:
+        # Choose chart reader type
+        print("Select FNF chart type:")
+        print("0: Auto-detect (default)")
+        for k, v in chart_types.items():
+            print(f"{k}: {v[0]}")
+        chart_type = input("Enter chart type number: ").strip() or '0'
+        while chart_type != '0' and chart_type not in chart_types:
+            logger.log(f"Invalid chart type entered: {chart_type}")
+            chart_type = input("Invalid. Enter chart type number: ").strip() or '0'
+        chart_class = chart_types[chart_type][1] if chart_type != '0' else None
+
+        chart_file = input("Enter chart file name or path: ").strip()
+        while not os.path.isfile(chart_file):
+            logger.log(f"Chart file not found: {chart_file}")
+            chart_file = input("File not found. Enter chart file name or path: ").strip()
+        # Sniff the format from the start of the file: picks the reader for auto-detect and
+        # catches a wrong manual pick (which used to play 0 notes without a word)
+        sniff_start = time.perf_counter()
+        try:
+            sniff = sniff_chart_file(chart_file)
+        except ValueError as e:
+            logger.log(f"Could not detect chart format: {e}", level=WARNING)
+            sniff = ChartSniff('unknown', None, [])
+        logger.log(f"Detected chart format: {sniff.format}"
+                   f"{f' ({sniff.reader.__name__})' if sniff.reader else ''}"
+                   f" in {(time.perf_counter() - sniff_start) * 1000:.1f} ms")
+        if chart_class is None:
+            chart_class = sniff.reader
+            while chart_class is None:
+                chart_type = input(f"Could not detect a playable chart ({sniff.format}). Enter chart type number: ").strip()
+                if chart_type in chart_types:
+                    chart_class = chart_types[chart_type][1]
+        elif sniff.reader is not None and (issubclass(sniff.reader, SectionChartReader)
+                                           != issubclass(chart_class, SectionChartReader)):
+            # Matt / Dustin / Doors share one section engine (and Matt is only the sniffer's
+            # fallback guess), so only a base game vs. sectioned mismatch is worth a prompt
+            logger.log(f"Chart looks like {sniff.reader.__name__}, not {chart_class.__name__}", level=WARNING)
+            if input(f"Use {sniff.reader.__name__} instead? (y/n, default y): ").strip().lower() != 'n':
+                chart_class = sniff.reader
+        elif sniff.reader is None:
+            logger.log(f"File looks like a {sniff.format} file, not a chart; it may have no notes", level=WARNING)
+        # A typed path can still use its catalog entry if it was indexed with the same reader
+        catalog_row = catalog.lookup(chart_file)
+        if catalog_row is not None and catalog_row['reader'] != chart_class.__name__:
+            catalog_row = None
+    # Parse the chart once (unless the catalog already knows it); the parsed document is handed
+    # to main() so the reader does not load the file again
+    document = None
+    if catalog_row is None:
+        try:
+            document = ChartDocument(chart_file, chart_class)
+        except Exception as e:
+            logger.log(f"Error reading chart: {e}", level=ERROR)
     difficulty = None
     if chart_class == FNFChartReader:
-        # Load file temporarily to list available difficulties (keys inside notes object)
-        with open(chart_file, 'r') as f:
-            data = json.load(f)
-        available_difficulties = list(data.get('notes', {}).keys())
+        if catalog_row is not None:
+            available_difficulties = catalog_row['difficulties']
+        else:
+            # Sniffed from the sibling metadata (menu order), else every difficulty in the notes
+            available_difficulties = [d for d in sniff.difficulties if document is None or d in document.tables] \
+                or (document.difficulties if document is not None else [])
         print(f"Available difficulties: {', '.join(available_difficulties)}")
         difficulty = input("Enter difficulty: ").strip().lower()
         while difficulty not in available_difficulties:
@@ -288,7 +1588,7 @@ def ask_user(logger):
     # If we're in a Matt chart (swap_by_must_hit logic) we also need key bindings for opponent lanes
     # because when mustHitSection is false those lanes become the player's lanes temporarily.
     # Only ask for lanes not already assigned above.
-    if chart_class.__name__ in ('MattChartReader', 'DoorsChartReader'):
+    if chart_class.SECTIONED:
         missing_opp_controls = [l for l in opponent_lanes if l not in controls]
         if missing_opp_controls:
             print("Because mustHitSection swapping is active, provide keys for opponent lanes (used when mustHitSection is false):")
@@ -303,41 +1603,10 @@ def ask_user(logger):
 
     # Detect all special note types in the chart
     detected_special_notes = set(['bullet', 'death', 'poison'])  # Seed with known special notes
-    try:
-        with open(chart_file, 'r') as f:
-            chart_data = json.load(f)
-        chart_class_name = chart_class.__name__
-        note_types_found = set()
-        if chart_class_name == 'FNFChartReader':
-            for diff in chart_data.get('notes', {}).values():
-                for note in diff:
-                    t = note.get('type', None)
-                    if isinstance(t, str):
-                        note_types_found.add(t)
-        elif chart_class_name == 'MattChartReader':
-            song_data = chart_data.get('song', {})
-            sections = song_data.get('notes', [])
-            # Check for special notes in sectionNotes arrays
-            for section in sections:
-                if isinstance(section, dict) and 'sectionNotes' in section:
-                    for note in section['sectionNotes']:
-                        # If note has a 4th element and it's a string, treat as special note
-                        if len(note) > 3 and isinstance(note[3], str):
-                            note_types_found.add(note[3])
-        elif chart_class_name == 'DoorsChartReader':
-            song_data = chart_data.get('song', {})
-            sections = song_data.get('notes', [])
-            for section in sections:
-                if isinstance(section, dict) and 'sectionNotes' in section:
-                    for note in section['sectionNotes']:
-                        if isinstance(note, list) and len(note) > 3 and isinstance(note[3], str) and note[3] != "":
-                            note_types_found.add(note[3])
-        # Add any new string types to detected_special_notes
-        for t in note_types_found:
-            if t not in detected_special_notes:
-                detected_special_notes.add(t)
-    except Exception as e:
-        logger.log(f"Error detecting special notes: {e}")
+    if catalog_row is not None:
+        detected_special_notes.update(catalog_row['special_types'])
+    elif document is not None:
+        detected_special_notes.update(document.special_types)
 
     # Turn the set into a list to iterate in stable order (display). Order not guaranteed.
     special_notes = list(detected_special_notes)
@@ -362,9 +1631,20 @@ def ask_user(logger):
 
     print_presses = input("Print out what is pressed? (y/n): ").strip().lower() == 'y'
 
-    # Matt/Doors-specific option: whether to swap lanes based on mustHitSection semantics
-    # For Matt & Doors charts we ALWAYS apply swapping semantics (mustHitSection True => base player lanes)
-    swap_by_must_hit = (chart_class.__name__ in ('MattChartReader', 'DoorsChartReader'))  # Always true for Matt/Doors
+    # Which library actually sends the key events
+    key_backend = input(f"Key backend ({'/'.join(KEY_BACKENDS)}, default keyboard): ").strip().lower() or 'keyboard'
+    while key_backend not in KEY_BACKENDS:
+        logger.log(f"Invalid key backend entered: {key_backend}")
+        key_backend = input(f"Invalid. Enter one of {', '.join(KEY_BACKENDS)}: ").strip().lower() or 'keyboard'
+
+    # Start timing: the chart folder's .offset file plus (optionally) the measured key latency
+    timing = calibrate_settings(
+        {'chart_file': chart_file, 'key_backend': key_backend}, logger,
+        measure=input("Measure key backend latency now? (y/n, default n): ").strip().lower() == 'y')
+
+    # Sectioned-chart option: whether to swap lanes based on mustHitSection semantics
+    # For Matt, Doors & Dustin charts we ALWAYS apply swapping semantics (mustHitSection True => base player lanes)
+    swap_by_must_hit = chart_class.SECTIONED  # Always true for sectioned charts
 
     # Ask to save all settings as a preset at the end
     if input("Save all these answers as a preset? (y/n): ").strip().lower() == 'y':
@@ -380,7 +1660,11 @@ def ask_user(logger):
             'extra_settings': extra_settings,
             'print_presses': print_presses,
             'chart_class': chart_class.__name__,
-            'swap_by_must_hit': swap_by_must_hit
+            'swap_by_must_hit': swap_by_must_hit,
+            'key_backend': key_backend,
+            'chart_offset_ms': timing['chart_offset_ms'],
+            'input_latency_ms': timing.get('input_latency_ms', 0.0),
+            'lead_offset_ms': timing['lead_offset_ms']
         })
 
     # Return settings bundle consumed by main playback logic
@@ -394,31 +1678,1666 @@ def ask_user(logger):
         'controls': controls,
         'special_note_settings': special_note_settings,
         'extra_settings': extra_settings,
-    'print_presses': print_presses,
-    'swap_by_must_hit': swap_by_must_hit
+        'print_presses': print_presses,
+        'swap_by_must_hit': swap_by_must_hit,
+        'key_backend': key_backend,
+        'chart_offset_ms': timing['chart_offset_ms'],
+        'input_latency_ms': timing.get('input_latency_ms', 0.0),
+        'lead_offset_ms': timing['lead_offset_ms'],
+        'document': document  # Already parsed chart (not saved in presets)
     }
 
-def wait_for_t():
-    """Block until the user presses and releases 'T' to begin playback.
-    Returns the timestamp when playback should start."""
+# Settings for --chart without --preset: the game's default arrow keys on both strumlines
+# (a mustHitSection swap hands the opponent lanes to the player)
+CLI_DEFAULT_SETTINGS = {
+    'lanes': [0, 1, 2, 3],
+    'opponent_lanes': [4, 5, 6, 7],
+    'controls': {0: 'left', 1: 'down', 2: 'up', 3: 'right', 4: 'left', 5: 'down', 6: 'up', 7: 'right'},
+    'special_note_settings': {},
+    'extra_settings': {'space': None},
+    'print_presses': False,
+    'key_backend': 'keyboard',
+}
+
+def cli_settings(args, logger):
+    """Settings for a non-interactive run (--preset, --chart, --type, --difficulty).
+
+    --chart replaces the preset's chart (and its .offset based lead) and defaults to
+    --type auto, which sniffs the reader from the start of the file. Returns None after
+    logging the reason if the preset or chart can't be used.
+    """
+    if args.preset:
+        preset_data = load_preset(args.preset)
+        if preset_data is None:
+            logger.log(f"Preset not found: {args.preset}", level=ERROR)
+            return None
+        logger.log(f"Loaded preset: {args.preset}")
+        settings = settings_from_preset(preset_data)
+    else:
+        settings = dict(CLI_DEFAULT_SETTINGS, difficulty=None)
+    if args.chart:
+        if not os.path.isfile(args.chart):
+            logger.log(f"Chart file not found: {args.chart}", level=ERROR)
+            return None
+        settings['chart_file'] = args.chart
+        settings['chart_offset_ms'] = chart_offset_ms(args.chart)
+        settings['lead_offset_ms'] = round(settings.get('input_latency_ms', 0.0) - settings['chart_offset_ms'], 3)
+    chart_type = args.type or ('auto' if args.chart else None)
+    sniff = None
+    if chart_type == 'auto':
+        sniff_start = time.perf_counter()
+        try:
+            sniff = sniff_chart_file(settings['chart_file'])
+        except ValueError as e:
+            logger.log(f"Could not detect chart format: {e}", level=ERROR)
+            return None
+        if sniff.reader is None:
+            logger.log(f"Could not detect a playable chart ({sniff.format}); pass --type", level=ERROR)
+            return None
+        logger.log(f"Detected chart format: {sniff.format} ({sniff.reader.__name__}) "
+                   f"in {(time.perf_counter() - sniff_start) * 1000:.1f} ms")
+        settings['chart_class'] = sniff.reader
+    elif chart_type:
+        settings['chart_class'] = CHART_TYPE_NAMES[chart_type]
+    if args.chart or args.type:
+        settings['swap_by_must_hit'] = settings['chart_class'].SECTIONED
+        if settings['chart_class'] is not FNFChartReader:
+            settings['difficulty'] = None
+    if args.difficulty:
+        settings['difficulty'] = args.difficulty.strip().lower()
+    if settings['chart_class'] is FNFChartReader:
+        known = sniff.difficulties if sniff is not None else []
+        if not settings.get('difficulty'):
+            if not known:
+                logger.log("No difficulty given and none could be sniffed; pass --difficulty", level=ERROR)
+                return None
+            settings['difficulty'] = known[0]
+            logger.log(f"Difficulty: {settings['difficulty']} (first listed; pass --difficulty to pick another)")
+        elif known and settings['difficulty'] not in known:
+            logger.log(f"Difficulty '{settings['difficulty']}' not among {', '.join(known)}", level=WARNING)
+    settings.setdefault('key_count', len(settings['lanes']))
+    return settings
+
+# Compiled playback actions. Releases sort before presses at the same instant so a lane is
+# let go before it is pressed again. chord is None, or the tuple of member actions when several
+# presses (or releases) are emitted together as one step.
+ACTION_RELEASE = 0
+ACTION_PRESS = 1
+Action = namedtuple('Action', 'time kind seq lane key note_index message chord', defaults=(None,))
+CHORD_EPSILON_DEFAULT = 0.001  # Presets can override it with "chord_epsilon_ms" (negative disables chords)
+
+class CompiledTimeline:
+    """Flat, time-sorted list of press/release actions produced by compile_timeline()."""
+    def __init__(self, actions, stats, steps=None):
+        self.actions = actions  # list[Action], sorted by (time, kind, seq)
+        self.stats = stats      # counters gathered while compiling (for the log)
+        self.steps = actions if steps is None else steps  # What the scheduler runs (chords grouped)
+    def __len__(self):
+        return len(self.actions)
+
+def group_chords(actions, epsilon=CHORD_EPSILON_DEFAULT):
+    """Merge runs of same-kind actions within epsilon seconds of the run's first one into chords.
+
+    A chord keeps its first member's time, seq, lane and key and lists every member in .chord,
+    so the scheduler wakes once and the backend emits the whole chord as one batch. Members
+    stay in the flat action list for telemetry. epsilon < 0 returns the actions unchanged.
+    """
+    if epsilon < 0 or not actions:
+        return list(actions)
+    steps = []
+    run = [actions[0]]
+    for action in actions[1:]:
+        first = run[0]
+        if action.kind == first.kind and action.time - first.time <= epsilon:
+            run.append(action)
+            continue
+        steps.append(first if len(run) == 1 else first._replace(chord=tuple(run)))
+        run = [action]
+    steps.append(run[0] if len(run) == 1 else run[0]._replace(chord=tuple(run)))
+    return steps
+
+def should_hit_type(note_type, special_note_settings):
+    """Decide whether a note of this type is pressed (0 = normal note, bullet always hit)."""
+    if note_type == 0 or note_type == 'bullet':
+        return True
+    # death/poison default to skipped when the preset has no answer, anything else defaults to hit
+    return special_note_settings.get(note_type, note_type not in ('death', 'poison'))
+
+# Per-key timing: a press is held at least MIN_HOLD_DEFAULT and a key stays released at
+# least RELEASE_GAP_DEFAULT before it is pressed again, so the game sees every key-down.
+# Presets can override them with "min_hold_ms" / "release_gap_ms".
+MIN_HOLD_DEFAULT = 0.01
+RELEASE_GAP_DEFAULT = 0.01
+
+class TimelineCompiler:
+    """Incremental core of compile_timeline(): feed() time-sorted notes, get actions back.
+
+    Every per-note decision (lane swap by mustHitSection, special note skipping, key lookup,
+    hold length) happens here, before playback reaches the note. Each key runs a small state
+    machine: up, or down since a press with a pending release. State is per key, not per lane,
+    because the game only sees keys: with the mustHitSection swap two lanes (e.g. 0 and 4) can
+    resolve to the same key. A note whose key is still down (a jack inside the minimum hold, a
+    note during a sustain, or another lane on the same key) ends the hold early so the key is up
+    for release_gap before the re-press. The gap always wins: if the two notes are too close for
+    both min_hold and release_gap, the hold is cut below min_hold (counted in
+    stats['short_holds']). A note no further than release_gap from the previous press of its key
+    is the same hit twice and is dropped. A release is only handed out once no later note can
+    move it, or at finish().
+    """
+    def __init__(self, settings, chart_class, logger=None):
+        self.controls = settings['controls']
+        self.special_note_settings = settings.get('special_note_settings', {})
+        self.sectioned = chart_class.SECTIONED
+        # Default to True for Matt even if missing in preset
+        self.swap_by_must_hit = settings.get('swap_by_must_hit', self.sectioned)
+        base_player_lanes = frozenset(settings['lanes'])
+        base_opponent_lanes = frozenset(settings.get('opponent_lanes', []))
+        # Resolve the two possible lane roles once instead of per note
+        self.roles = {
+            None: (base_player_lanes, base_opponent_lanes),
+            True: (base_player_lanes, base_opponent_lanes),
+            False: (base_opponent_lanes, base_player_lanes),
+        }
+        self.print_presses = settings.get('print_presses', False)
+        self.lead = settings.get('lead_offset_ms', 0.0) / 1000.0  # Every action is scheduled this much earlier
+        self.min_hold = settings.get('min_hold_ms', MIN_HOLD_DEFAULT * 1000.0) / 1000.0
+        self.release_gap = settings.get('release_gap_ms', RELEASE_GAP_DEFAULT * 1000.0) / 1000.0
+        self.logger = logger
+        self.debug_enabled = logger is not None and logger.enabled(DEBUG)
+        self.hit_type = []  # Hit / skip decision per interned type id (grows with the table)
+        self.pending_release = {}  # key -> (press time, release Action not handed out yet): key is down
+        self.seq = 0  # Creation order; doubles as a unique telemetry slot
+        self.stats = {'notes': 0, 'presses': 0, 'releases': 0, 'skipped_special': 0,
+                      'opponent': 0, 'unbound': 0, 'unknown_lane': 0, 'shortened_holds': 0,
+                      'short_holds': 0, 'dropped_duplicates': 0}
+
+    def feed(self, notes, start=0, end=None):
+        """Compile notes[start:end], which must not be earlier than anything fed before.
+
+        Returns the presses plus every release that can no longer be superseded (unsorted).
+        """
+        end = len(notes) if end is None else end
+        stats = self.stats
+        stats['notes'] += end - start
+        hit_type = self.hit_type
+        for note_type in notes.type_names[len(hit_type):]:
+            hit_type.append(should_hit_type(note_type, self.special_note_settings))
+        controls, roles, pending_release = self.controls, self.roles, self.pending_release
+        sectioned_swap = self.sectioned and self.swap_by_must_hit
+        verb = 'Pressing' if self.print_presses else 'Pressed'
+        logger = self.logger
+        debug_enabled = self.debug_enabled and self.sectioned
+        lead = self.lead
+        min_hold, gap = self.min_hold, self.release_gap
+        ready = []
+        times, lanes, sustains, type_ids, must_hits = notes.time, notes.lane, notes.sustain, notes.type_id, notes.must_hit
+        for idx in range(start, end):
+            note_time = times[idx] - lead
+            lane = lanes[idx]
+            must_hit = bool(must_hits[idx]) if sectioned_swap and must_hits[idx] >= 0 else None
+            player_lanes, opponent_lanes = roles[must_hit]
+
+            # Debug classification (first few notes) to help diagnose issues
+            if debug_enabled and idx < 30:
+                logger.debug(
+                    f"DEBUG note_idx={idx} t={note_time:.3f} lane={lane} mustHit={must_hit} player_lanes={sorted(player_lanes)} opp_lanes={sorted(opponent_lanes)} class={'PLAYER' if lane in player_lanes else ('OPP' if lane in opponent_lanes else 'UNKNOWN')}"
+                )
+
+            if lane not in player_lanes:
+                if lane in opponent_lanes:
+                    stats['opponent'] += 1
+                else:
+                    stats['unknown_lane'] += 1
+                continue
+            if not hit_type[type_ids[idx]]:
+                stats['skipped_special'] += 1
+                continue
+            if lane not in controls:
+                stats['unbound'] += 1
+                continue
+            key = controls[lane]
+            if not key:
+                if logger:
+                    logger.warning(f"WARNING: Empty key binding for lane {lane}; skipping press.")
+                stats['unbound'] += 1
+                continue
+
+            sustain = sustains[idx]
+            hold_time = max(min_hold, sustain / 1000.0) if sustain > 0 else min_hold  # Minimal hold for taps
+            down = pending_release.get(key)
+            if down is not None:
+                pressed_at, release = down
+                if note_time - pressed_at <= gap:
+                    stats['dropped_duplicates'] += 1  # No room to release and press again
+                    continue
+                del pending_release[key]
+                free_at = note_time - gap
+                if release.time > free_at:
+                    # Key still down when this note arrives: end the hold early, keeping the gap
+                    release = release._replace(time=free_at)
+                    stats['shortened_holds'] += 1
+                    if free_at - pressed_at < min_hold:
+                        stats['short_holds'] += 1  # Held less than min_hold so the game still sees the re-press
+                ready.append(release)
+            ready.append(Action(note_time, ACTION_PRESS, self.seq, lane, key, idx,
+                                f"{verb}: {key} (lane {lane}, time {note_time}, hold {hold_time:.3f}s)"))
+            pending_release[key] = (note_time, Action(note_time + hold_time, ACTION_RELEASE, self.seq + 1, lane, key, idx, None))
+            self.seq += 2
+        if end > start:
+            # Later notes are not earlier than the newest one, so releases a gap before it are final
+            settled = times[end - 1] - lead - gap
+            for key in [key for key, (_, release) in pending_release.items() if release.time <= settled]:
+                ready.append(pending_release.pop(key)[1])
+        return ready
+
+    def finish(self):
+        """Hand out the releases still pending once no more notes will be fed."""
+        ready = [release for _, release in self.pending_release.values()]
+        self.pending_release.clear()
+        return ready
+
+# Side-channel events: cues that are not notes (subtitles, camera moves, script triggers, dodge
+# prompts). They are only read when a preset maps an event name to a key, and then become
+# press/release actions on EVENT_LANE, scheduled like notes. time is chart seconds.
+ChartEvent = namedtuple('ChartEvent', 'time name args source')
+EVENT_LANE = -1
+EVENT_FILES = ('events.json', 'modchart.xml')  # Looked for next to the chart, plus every *.lua there
+STEPS_PER_SECTION = 16
+LUA_STEP_CUE = re.compile(r'\bcur(Step|Beat)\s*==\s*(\d+)')
+
+def events_from_list(entries, source):
+    """Events from a chart's events list, in any of the observed shapes:
+      {"t": ms, "e": name, "v": value}                    (base-game v2, top level)
+      [ms, [[name, value1, value2], ...]]                 (song.events / events.json)
+      [ms, name, value1, value2]                          (older single-event entries)
+    Anything else is skipped.
+    """
+    events = []
+    for entry in entries if isinstance(entries, list) else ():
+        if isinstance(entry, dict):
+            if isinstance(entry.get('t'), (int, float)) and isinstance(entry.get('e'), str):
+                events.append(ChartEvent(entry['t'] / 1000.0, entry['e'], (entry.get('v'),), source))
+            continue
+        if not isinstance(entry, list) or len(entry) < 2 or not isinstance(entry[0], (int, float)):
+            continue
+        for sub in entry[1] if isinstance(entry[1], list) else (entry[1:],):
+            if isinstance(sub, list) and sub and isinstance(sub[0], str):
+                events.append(ChartEvent(entry[0] / 1000.0, sub[0], tuple(sub[1:]), source))
+    return events
+
+def step_clock(data):
+    """step -> chart seconds for a sectioned chart, following song.bpm and each section's
+    changeBPM. Returns None when the chart has no BPM (steps cannot be placed)."""
+    song = data.get('song') if isinstance(data, dict) else None
+    bpm = song.get('bpm') if isinstance(song, dict) else None
+    if not isinstance(bpm, (int, float)) or bpm <= 0:
+        return None
+    starts, segments = [0.0], [(0.0, 15.0 / bpm)]  # (chart seconds at segment start, seconds per step)
+    step = seconds = 0.0
+    for section in SectionChartReader.song_sections(data):
+        if not isinstance(section, dict):
+            continue
+        new_bpm = section.get('bpm')
+        if section.get('changeBPM') and isinstance(new_bpm, (int, float)) and new_bpm > 0 and new_bpm != bpm:
+            bpm = new_bpm
+            starts.append(step)
+            segments.append((seconds, 15.0 / bpm))
+        length = section.get('lengthInSteps')
+        length = length if isinstance(length, (int, float)) and length > 0 else STEPS_PER_SECTION
+        step += length
+        seconds += length * 15.0 / bpm
+
+    def step_time(at_step):
+        i = bisect.bisect_right(starts, at_step) - 1
+        start_seconds, step_seconds = segments[max(i, 0)]
+        return start_seconds + (at_step - starts[max(i, 0)]) * step_seconds
+    return step_time
+
+def modchart_events(path, step_time):
+    """<Event step="..." type="..."/> entries of a modchart.xml, named by their type."""
+    import xml.etree.ElementTree as ElementTree  # Only needed when a preset handles events
+    events = []
+    source = os.path.basename(path)
+    for element in ElementTree.parse(path).iter('Event'):
+        try:
+            at = step_time(float(element.get('step')))
+        except (TypeError, ValueError):
+            continue  # Init events have no step
+        args = tuple((k, v) for k, v in element.attrib.items() if k not in ('step', 'type'))
+        events.append(ChartEvent(at, element.get('type', ''), args, source))
+    return events
+
+def lua_events(path, step_time):
+    """curStep == N / curBeat == N checks in a script, as events named after the script file."""
+    with open(path, encoding='utf-8', errors='replace') as f:
+        text = f.read()
+    name = os.path.splitext(os.path.basename(path))[0]
+    events = []
+    for unit, value in LUA_STEP_CUE.findall(text):
+        step = int(value) * (4 if unit == 'Beat' else 1)
+        events.append(ChartEvent(step_time(step), name, (f'cur{unit}', int(value)), os.path.basename(path)))
+    return events
+
+def load_chart_events(chart_path, logger=None, data=None):
+    """Every side-channel event for a chart, sorted by time: the chart's own events list plus
+    events.json, modchart.xml and *.lua scripts in its folder. Files that fail to parse are
+    skipped with a warning; step-based files are skipped when the chart has no BPM. data is
+    the chart's already parsed JSON (ChartDocument.data); the file is only read without it."""
+    def document_events(data, path):
+        events = []
+        for container in (data, data.get('song') if isinstance(data, dict) else None):
+            if isinstance(container, dict):
+                events.extend(events_from_list(container.get('events'), os.path.basename(path)))
+        return events
+
+    folder = os.path.dirname(chart_path) or '.'
+    if data is None:
+        data = decode_json(read_chart_buffer(chart_path))
+    events = document_events(data, chart_path)
+    step_time = step_clock(data)
+    paths = [os.path.join(folder, name) for name in EVENT_FILES]
+    paths += sorted(os.path.join(folder, name) for name in os.listdir(folder) if name.lower().endswith('.lua'))
+    for path in paths:
+        if not os.path.isfile(path):
+            continue
+        try:
+            if path.endswith('.json'):
+                events.extend(document_events(decode_json(read_chart_buffer(path)), path))
+            elif step_time is None:
+                if logger:
+                    logger.log(f"Events: {os.path.basename(path)} skipped, the chart has no BPM to place steps", level=WARNING)
+            elif path.endswith('.xml'):
+                events.extend(modchart_events(path, step_time))
+            else:
+                events.extend(lua_events(path, step_time))
+        except Exception as e:
+            if logger:
+                logger.log(f"Events: could not read {path}: {e}", level=WARNING)
+    events.sort(key=lambda event: event.time)
+    return events
+
+def event_keys(settings):
+    """Event name (lowercase) -> key, from the preset's "event_keys".
+
+    A value naming an extra mechanic ('space') means that mechanic's bound key; if the mechanic
+    is unbound the event is not handled. An empty result (no "event_keys") means events are
+    never loaded.
+    """
+    extra_settings = settings.get('extra_settings') or {}
+    keys = {}
+    for name, key in settings.get('event_keys', {}).items():
+        if key in extra_settings:
+            key = extra_settings[key]
+        if key:
+            keys[name.lower()] = normalize_key(key)
+    return keys
+
+def compile_events(events, keys, settings):
+    """Press/release actions for events whose name has a key (tapped for min_hold).
+
+    They use EVENT_LANE and note_index -1, -2, ... (one per event) so they never pair up with
+    notes. An event closer than min_hold + release_gap to the previous one on its key is dropped.
+    """
+    lead = settings.get('lead_offset_ms', 0.0) / 1000.0
+    min_hold = settings.get('min_hold_ms', MIN_HOLD_DEFAULT * 1000.0) / 1000.0
+    spacing = min_hold + settings.get('release_gap_ms', RELEASE_GAP_DEFAULT * 1000.0) / 1000.0
+    verb = 'Pressing' if settings.get('print_presses', False) else 'Pressed'
+    last_press = {}
+    actions = []
+    for i, event in enumerate(events):
+        key = keys.get(event.name.lower())
+        if key is None:
+            continue
+        at = event.time - lead
+        if at - last_press.get(key, float('-inf')) < spacing:
+            continue
+        last_press[key] = at
+        actions.append(Action(at, ACTION_PRESS, 0, EVENT_LANE, key, -(i + 1),
+                              f"{verb}: {key} (event {event.name} from {event.source}, time {at})"))
+        actions.append(Action(at + min_hold, ACTION_RELEASE, 0, EVENT_LANE, key, -(i + 1), None))
+    return actions
+
+COMPILE_SLICE_NOTES = 1000  # Notes compiled per step when compile_timeline is given between_steps
+
+def compile_timeline(notes, settings, chart_class, logger=None, between_steps=None, slice_notes=COMPILE_SLICE_NOTES,
+                     events=None):
+    """Turn a whole note table plus settings into pre-resolved press/release actions.
+
+    Uses TimelineCompiler in one go, so the real-time loop only walks actions. Release times
+    are derived from each note's scheduled time. With between_steps, notes are compiled
+    slice_notes at a time and between_steps() is called before each slice; the
+    seconds it returns (time spent waiting) are left out of compile_ms. events are actions
+    from compile_events(), merged into the same timeline.
+    """
+    started = time.perf_counter()
+    compiler = TimelineCompiler(settings, chart_class, logger)
+    if between_steps is None:
+        actions = compiler.feed(notes)
+    else:
+        actions = []
+        for first in range(0, len(notes), slice_notes):
+            started += between_steps() or 0.0
+            actions.extend(compiler.feed(notes, first, min(first + slice_notes, len(notes))))
+    actions.extend(compiler.finish())
+    actions.extend(events or ())
+    actions.sort()
+    # Renumber so seq doubles as the action's index in the timeline (used by telemetry)
+    actions = [a._replace(seq=i) for i, a in enumerate(actions)]
+    stats = compiler.stats
+    stats['presses'] = sum(1 for a in actions if a.kind == ACTION_PRESS)
+    stats['releases'] = len(actions) - stats['presses']
+    stats['event_presses'] = len(events or ()) // 2
+    # Lane density: the busiest second of presses per lane vs. what one lane can sustain
+    lane_presses = {}
+    for action in actions:
+        if action.kind == ACTION_PRESS:
+            lane_presses.setdefault(action.lane, []).append(action.time)
+    stats['lane_peak_nps'] = {lane: peak_rate(times) for lane, times in sorted(lane_presses.items())}
+    stats['longest_hold'] = max(compiler.min_hold, max(notes.sustain, default=0.0) / 1000.0)  # Bounds seek scans
+    stats['min_hold_ms'] = compiler.min_hold * 1000.0
+    stats['release_gap_ms'] = compiler.release_gap * 1000.0
+    stats['lane_max_nps'] = 1.0 / (compiler.min_hold + compiler.release_gap)
+    steps = group_chords(actions, settings.get('chord_epsilon_ms', CHORD_EPSILON_DEFAULT * 1000.0) / 1000.0)
+    stats['chords'] = sum(1 for step in steps if step.chord)
+    stats['steps'] = len(steps)
+    stats['compile_ms'] = (time.perf_counter() - started) * 1000.0
+    if logger:
+        logger.log(
+            f"Compiled timeline: {len(actions)} actions ({stats['presses']} presses, {stats['releases']} releases) "
+            f"from {stats['notes']} notes in {stats['compile_ms']:.2f} ms; skipped {stats['skipped_special']} special, "
+            f"{stats['opponent']} opponent, {stats['unbound']} unbound, {stats['unknown_lane']} unknown-lane notes; "
+            f"{stats['steps']} scheduler steps ({stats['chords']} chords)"
+            + (f"; {stats['event_presses']} presses from events" if stats['event_presses'] else "")
+        )
+        logger.log(
+            f"Lane timing: {stats['shortened_holds']} holds shortened ({stats['short_holds']} below the minimum hold), "
+            f"{stats['dropped_duplicates']} duplicate notes dropped; "
+            f"peak NPS per lane {stats['lane_peak_nps']} (one lane sustains {stats['lane_max_nps']:.0f} NPS with "
+            f"{stats['min_hold_ms']:g} ms hold + {stats['release_gap_ms']:g} ms gap)"
+        )
+    return CompiledTimeline(actions, stats, steps)
+
+def peak_rate(sorted_times, window=1.0):
+    """Most events inside any window-second span of a sorted list of times."""
+    peak = 0
+    first = 0
+    for last, t in enumerate(sorted_times):
+        while t - sorted_times[first] >= window:
+            first += 1
+        peak = max(peak, last - first + 1)
+    return peak
+
+def parse_chart_time(text):
+    """Chart time in seconds from '83.5', '83.5s', '83500ms' or 'm:ss.s' ('1:23.5')."""
+    text = text.strip().lower()
+    if text.endswith('ms'):
+        return float(text[:-2]) / 1000.0
+    if text.endswith('s'):
+        text = text[:-1]
+    if ':' in text:
+        minutes, seconds = text.split(':', 1)
+        return int(minutes) * 60 + float(seconds)
+    return float(text)
+
+# Part of a chart to play (--from/--from-section/--to/--to-section/--loop). Times are chart
+# seconds; None means the start or end of the song. end_section is inclusive.
+SeekRequest = namedtuple('SeekRequest', 'start start_section end end_section loop', defaults=(None, None, None, None, False))
+# A resolved seek: chart seconds it covers and the scheduler steps that play it
+PlaybackRegion = namedtuple('PlaybackRegion', 'start end actions steps held released')
+
+def resolve_seek(request, notes):
+    """Turn a SeekRequest into (start, end) chart seconds; end is None for the end of the song.
+
+    Sections are looked up in notes.section_starts() (bisected, so a section without notes
+    starts where the next one with notes does). Raises ValueError for charts without sections
+    or a start past the last note.
+    """
+    start, end = request.start or 0.0, request.end
+    if request.start_section is not None or request.end_section is not None:
+        starts = notes.section_starts()
+        sections = sorted(starts)
+        if not sections or sections[0] < 0:
+            raise ValueError("this chart has no sections to seek to")
+        if request.start_section is not None:
+            i = bisect.bisect_left(sections, request.start_section)
+            if i == len(sections):
+                raise ValueError(f"no notes in section {request.start_section} or later")
+            start = notes.time[starts[sections[i]]]
+        if request.end_section is not None:
+            i = bisect.bisect_right(sections, request.end_section)  # Up to the start of the next section
+            end = notes.time[starts[sections[i]]] if i < len(sections) else None
+    last_note = notes.time[-1] if len(notes) else 0.0
+    if start > last_note:
+        raise ValueError(f"nothing to play after {start:.3f} s (last note at {last_note:.3f} s)")
+    if end is not None and end <= start:
+        raise ValueError(f"seek end {end:.3f} s is not after its start {start:.3f} s")
+    return start, end
+
+def seek_region(timeline, start, end=None, lead=0.0, release_gap=RELEASE_GAP_DEFAULT, epsilon=CHORD_EPSILON_DEFAULT):
+    """Cut the actions from chart time start up to end out of a compiled timeline.
+
+    Both ends are found by bisecting the time-sorted actions, and only the last longest_hold
+    seconds before each end are looked at, so seeking costs O(log n) plus the region itself.
+    Sustains pressed before start and released after it are pressed again at start; keys still
+    down at end are released release_gap before it, so every lane is up when a loop repeats.
+    Lane roles, mustHitSection swaps and special note decisions were already made per note
+    at compile time, so nothing else needs rebuilding. Returns a PlaybackRegion.
+    """
+    actions = timeline.actions
+    longest_hold = timeline.stats.get('longest_hold', 0.0)
+    first = start - lead  # Action times already include the lead offset
+    # Releases exactly at the seek point belong to the notes before it
+    lo = bisect.bisect_left(actions, (first, ACTION_PRESS))
+    if end is None:
+        hi = len(actions)
+        last = (actions[-1].time if actions else first) + release_gap
+    else:
+        last = end - lead
+        hi = max(lo, bisect.bisect_left(actions, (last,)))
+
+    def still_down(window_start, window_end):
+        """Presses in actions[window_start:window_end] whose release is not in that slice too."""
+        down = {}
+        for action in actions[window_start:window_end]:
+            if action.kind == ACTION_PRESS:
+                down[action.note_index] = action
+            else:
+                down.pop(action.note_index, None)
+        return down
+
+    held = still_down(bisect.bisect_left(actions, (first - longest_hold,)), lo)
+    region = actions[lo:hi]
+    region.extend(press._replace(time=first) for press in held.values())
+    released = []
+    if hi < len(actions):
+        for note_index, press in still_down(bisect.bisect_left(actions, (last - longest_hold,)), hi).items():
+            if press.time < first and note_index not in held:
+                continue  # Released before the region started
+            release = next(actions[i] for i in range(hi, len(actions))
+                           if actions[i].kind == ACTION_RELEASE and actions[i].note_index == note_index)
+            pressed_at = max(press.time, first)
+            released.append(release._replace(time=last - release_gap if pressed_at < last - release_gap else last))
+        region.extend(released)
+    region.sort()
+    return PlaybackRegion(start, last + lead, region, group_chords(region, epsilon), len(held), len(released))
+
+# Scheduler tuning: sleep coarsely until this close to a deadline, then spin on perf_counter.
+# Presets can override it with "spin_threshold_ms".
+SPIN_THRESHOLD_DEFAULT = 0.002
+COARSE_SLEEP_MAX = 0.01  # Longest single sleep, so stop requests are still noticed quickly
+
+class PlaybackScheduler:
+    """Deadline-driven executor for compiled actions.
+
+    Presses and releases share one heap ordered by (time, kind, seq). Instead of waking every
+    millisecond, the scheduler sleeps until spin_threshold before the next deadline and then
+    busy-waits on time.perf_counter() for the last stretch, so it neither burns CPU in long gaps
+    nor overshoots by an OS sleep tick.
+    """
+    def __init__(self, actions, spin_threshold=SPIN_THRESHOLD_DEFAULT, coarse_sleep_max=COARSE_SLEEP_MAX,
+                 clock=time.perf_counter, sleep=time.sleep):
+        self.heap = list(actions)
+        heapq.heapify(self.heap)  # Already sorted when it comes from compile_timeline, so this is cheap
+        self.spin_threshold = spin_threshold
+        self.coarse_sleep_max = coarse_sleep_max
+        self.clock = clock  # Injectable so headless runs can use a VirtualClock
+        self.sleep = sleep
+        self.source = None  # Streaming mode: iterator of action batches still to be queued
+        self.lookahead = STREAM_LOOKAHEAD
+        self.horizon = max((a.time for a in self.heap), default=float('-inf'))  # Latest queued deadline
+        self.start_time = 0.0  # Set by run(), moved by delay()
+
+    def push(self, action):
+        """Add an action (e.g. one created while playing) to the queue."""
+        heapq.heappush(self.heap, action)
+        if action.time > self.horizon:
+            self.horizon = action.time
+
+    def feed(self, source, lookahead=STREAM_LOOKAHEAD):
+        """Attach an iterator of action batches (streaming mode) and queue its first lookahead seconds.
+
+        run() pulls further batches in the gaps between deadlines whenever less than lookahead
+        seconds of actions are queued.
+        """
+        self.source = source
+        self.lookahead = lookahead
+        while self.source is not None and self.needs_more():
+            self.pull()
+
+    def needs_more(self):
+        return not self.heap or self.heap[0].time + self.lookahead > self.horizon
+
+    def pull(self):
+        """Queue the next batch from the source. Returns False once it is exhausted."""
+        batch = next(self.source, None)
+        if batch is None:
+            self.source = None
+            return False
+        for action in batch:
+            self.push(action)
+        return True
+
+    def wait_until(self, deadline, should_stop=None):
+        """Block until the clock reaches deadline. Returns False if should_stop() fired first."""
+        spin_threshold = self.spin_threshold
+        clock = self.clock
+        while True:
+            remaining = deadline - clock()
+            if remaining <= 0:
+                return True
+            if remaining > spin_threshold:
+                if should_stop is not None and should_stop():
+                    return False
+                self.sleep(min(remaining - spin_threshold, self.coarse_sleep_max))
+            else:
+                # Final stretch: spin for sub-millisecond precision
+                while clock() < deadline:
+                    pass
+                return True
+
+    def run(self, start_time, execute, should_stop=None):
+        """Execute every queued action at start_time + action.time.
+
+        execute(action, now) is called with the elapsed playback time. Returns False if
+        playback was stopped early, True once the queue is empty. should_stop() may call
+        delay() (e.g. after a pause); the wait is then redone against the moved deadlines.
+        """
+        heap = self.heap
+        clock = self.clock
+        self.start_time = start_time
+        # Streaming: only parse when the next deadline is far enough away to absorb a batch
+        refill_margin = self.spin_threshold + COARSE_SLEEP_MAX
+        while heap or self.source is not None:
+            start_time = self.start_time
+            if self.source is not None and self.needs_more() and (
+                    not heap or start_time + heap[0].time - clock() > refill_margin
+                    or heap[0].time + self.lookahead / 2 > self.horizon):
+                self.pull()
+                continue
+            if not self.wait_until(start_time + heap[0].time, should_stop):
+                return False
+            if self.start_time != start_time:
+                continue  # Delayed while waiting
+            action = heapq.heappop(heap)
+            execute(action, clock() - start_time)
+        return True
+
+    def delay(self, seconds):
+        """Push every remaining deadline back by seconds (used to resume after a pause)."""
+        self.start_time += seconds
+
+    def requeue(self, actions):
+        """Replace the queue with actions, e.g. the same seek region again for the next loop."""
+        self.heap = list(actions)
+        heapq.heapify(self.heap)
+        self.horizon = max((a.time for a in self.heap), default=float('-inf'))
+
+class VirtualClock:
+    """Simulated time source for headless runs: sleep() advances time instantly instead of blocking.
+
+    Pair it with spin_threshold=0, since spinning on a clock that only moves in sleep() never ends.
+    """
+    def __init__(self, start=0.0):
+        self.now = start
+    def __call__(self):
+        return self.now
+    def sleep(self, seconds):
+        self.now += max(seconds, 1e-9)  # Always move forward so float rounding can't stall a wait
+
+class KeyBackend:
+    """Interface for the library/device that actually emits key events.
+
+    Keys are the same strings used in presets ('a', ';', 'space', 'up', ...).
+    """
+    name = 'base'
+    def press(self, key):
+        raise NotImplementedError
+    def release(self, key):
+        raise NotImplementedError
+    def press_many(self, keys):
+        """Press a chord. Backends that can batch events override this."""
+        for key in keys:
+            self.press(key)
+    def release_many(self, keys):
+        for key in keys:
+            self.release(key)
+    def check_key(self, key):
+        """Raise ValueError if this backend cannot send key (checked before playback starts)."""
+        pass
+    def close(self):
+        """Free any OS resources (devices, listener threads)."""
+        pass
+    def listen(self, on_key_down):
+        """Call on_key_down() for every key-down the OS delivers, like a game would see it.
+
+        Used by latency calibration. Returns a function that stops listening. The default
+        uses the keyboard module's global hook, which also sees uinput devices.
+        """
+        import keyboard as keyboard_module  # pip install keyboard
+        hook = keyboard_module.on_press(lambda event: on_key_down())
+        return lambda: keyboard_module.unhook(hook)
+
+class KeyboardBackend(KeyBackend):
+    """Emits keys through the 'keyboard' module (global hooks; needs root on Linux)."""
+    name = 'keyboard'
+    def __init__(self):
+        import keyboard as keyboard_module  # pip install keyboard
+        self.keyboard = keyboard_module
+    def press(self, key):
+        self.keyboard.press(key)
+    def release(self, key):
+        self.keyboard.release(key)
+    def check_key(self, key):
+        self.keyboard.key_to_scan_codes(key)  # Raises ValueError for names it can't map
+
+class PynputBackend(KeyBackend):
+    """Emits keys through pynput's Controller (what the boxing-match scripts use)."""
+    name = 'pynput'
+    def __init__(self):
+        from pynput.keyboard import Controller, Key, KeyCode  # pip install pynput
+        self.controller = Controller()
+        self.special_keys = Key
+        self.key_code = KeyCode
+        self.resolved = {}  # preset key string -> pynput key object
+    def _resolve(self, key):
+        resolved = self.resolved.get(key)
+        if resolved is None:
+            if len(key) == 1:
+                resolved = self.key_code.from_char(key)
+            else:
+                resolved = getattr(self.special_keys, key.replace(' ', '_'), None)  # e.g. 'space', 'up', 'caps lock'
+                if resolved is None:
+                    raise ValueError(f"pynput has no key named '{key}'")
+            self.resolved[key] = resolved
+        return resolved
+    def check_key(self, key):
+        self._resolve(key)
+    def press(self, key):
+        self.controller.press(self._resolve(key))
+    def release(self, key):
+        self.controller.release(self._resolve(key))
+    def listen(self, on_key_down):
+        from pynput.keyboard import Listener
+        listener = Listener(on_press=lambda key: on_key_down())
+        listener.start()
+        listener.wait()  # Hook is installed once this returns
+        return listener.stop
+
+# Linux input-event-codes.h key codes for the key names presets can use
+UINPUT_KEY_CODES = {
+    'esc': 1, '1': 2, '2': 3, '3': 4, '4': 5, '5': 6, '6': 7, '7': 8, '8': 9, '9': 10, '0': 11,
+    '-': 12, '=': 13, 'backspace': 14, 'tab': 15,
+    'q': 16, 'w': 17, 'e': 18, 'r': 19, 't': 20, 'y': 21, 'u': 22, 'i': 23, 'o': 24, 'p': 25,
+    '[': 26, ']': 27, 'enter': 28, 'ctrl': 29,
+    'a': 30, 's': 31, 'd': 32, 'f': 33, 'g': 34, 'h': 35, 'j': 36, 'k': 37, 'l': 38,
+    ';': 39, "'": 40, '`': 41, 'shift': 42, '\\': 43,
+    'z': 44, 'x': 45, 'c': 46, 'v': 47, 'b': 48, 'n': 49, 'm': 50, ',': 51, '.': 52, '/': 53,
+    'alt': 56, 'space': 57, 'caps lock': 58,
+    'f1': 59, 'f2': 60, 'f3': 61, 'f4': 62, 'f5': 63, 'f6': 64, 'f7': 65, 'f8': 66, 'f9': 67, 'f10': 68,
+    'f11': 87, 'f12': 88, 'up': 103, 'left': 105, 'right': 106, 'down': 108,
+}
+
+class UinputBackend(KeyBackend):
+    """Emits keys by writing evdev events to a virtual keyboard created through /dev/uinput (Linux).
+
+    Bypasses any userspace hooking library: one write() per key event plus a SYN_REPORT.
+    Needs write access to /dev/uinput (root or the 'input' group).
+    """
+    name = 'uinput'
+    EV_SYN = 0
+    EV_KEY = 1
+    SYN_REPORT = 0
+    UI_SET_EVBIT = 0x40045564   # _IOW('U', 100, int)
+    UI_SET_KEYBIT = 0x40045565  # _IOW('U', 101, int)
+    UI_DEV_CREATE = 0x5501      # _IO('U', 1)
+    UI_DEV_DESTROY = 0x5502     # _IO('U', 2)
+    EVENT = struct.Struct('llHHi')  # struct input_event: timeval, type, code, value
+
+    def __init__(self, device='/dev/uinput'):
+        import fcntl  # Linux only
+        self.fcntl = fcntl
+        self.fd = os.open(device, os.O_WRONLY | os.O_NONBLOCK)
+        fcntl.ioctl(self.fd, self.UI_SET_EVBIT, self.EV_KEY)
+        for code in set(UINPUT_KEY_CODES.values()):
+            fcntl.ioctl(self.fd, self.UI_SET_KEYBIT, code)
+        # Legacy struct uinput_user_dev: name[80], input_id (bustype, vendor, product, version),
+        # ff_effects_max, then absmax/absmin/absfuzz/absflat[64] (unused for a keyboard)
+        user_dev = struct.pack('80sHHHHi', b'fnf-player-virtual-keyboard', 0x03, 0x1234, 0x5678, 1, 0)
+        os.write(self.fd, user_dev + b'\0' * (4 * 64 * 4))
+        fcntl.ioctl(self.fd, self.UI_DEV_CREATE)
+        time.sleep(0.2)  # Give the compositor/X server a moment to pick up the new device
+    def _code(self, key):
+        code = UINPUT_KEY_CODES.get(key.lower())
+        if code is None:
+            raise ValueError(f"uinput backend has no key code for '{key}'")
+        return code
+    def check_key(self, key):
+        self._code(key)
+    def _emit(self, keys, value):
+        # Every key event of a chord, then a single SYN_REPORT: one write(), one input frame
+        event = self.EVENT
+        os.write(self.fd, b''.join([event.pack(0, 0, self.EV_KEY, self._code(key), value) for key in keys]) +
+                 event.pack(0, 0, self.EV_SYN, self.SYN_REPORT, 0))
+    def press(self, key):
+        self._emit((key,), 1)
+    def release(self, key):
+        self._emit((key,), 0)
+    def press_many(self, keys):
+        self._emit(keys, 1)
+    def release_many(self, keys):
+        self._emit(keys, 0)
+    def close(self):
+        try:
+            self.fcntl.ioctl(self.fd, self.UI_DEV_DESTROY)
+        finally:
+            os.close(self.fd)
+
+class NullBackend(KeyBackend):
+    """Emits nothing; records (clock time, 'press'/'release', key) for tests and dry runs."""
+    name = 'null'
+    def __init__(self, clock=time.perf_counter):
+        self.clock = clock
+        self.events = []
+        self.listeners = []  # on_key_down callbacks (calibration measures the software path only)
+    def press(self, key):
+        self.events.append((self.clock(), 'press', key))
+        for on_key_down in self.listeners:
+            on_key_down()
+    def release(self, key):
+        self.events.append((self.clock(), 'release', key))
+    def press_many(self, keys):
+        now = self.clock()  # One batch, one timestamp
+        self.events.extend([(now, 'press', key) for key in keys])
+        for on_key_down in self.listeners:
+            on_key_down()
+    def release_many(self, keys):
+        now = self.clock()
+        self.events.extend([(now, 'release', key) for key in keys])
+    def listen(self, on_key_down):
+        self.listeners.append(on_key_down)
+        return lambda: self.listeners.remove(on_key_down)
+
+KEY_BACKENDS = {
+    # preset name -> backend class
+    'keyboard': KeyboardBackend,
+    'pynput': PynputBackend,
+    'uinput': UinputBackend,
+    'null': NullBackend,
+}
+
+def create_backend(name, keys=()):
+    """Instantiate a key backend by preset name and check it can send every key in keys.
+
+    Raises RuntimeError with a helpful message, so a bad binding fails before playback starts.
+    """
+    backend_class = KEY_BACKENDS.get(name)
+    if backend_class is None:
+        raise RuntimeError(f"Unknown key backend '{name}' (choose from {', '.join(KEY_BACKENDS)})")
+    try:
+        backend = backend_class()
+    except ImportError as e:
+        raise RuntimeError(f"Key backend '{name}' is not available: {e} (pip install {e.name or name})")
+    except OSError as e:
+        raise RuntimeError(f"Key backend '{name}' could not be opened: {e}")
+    for key in dict.fromkeys(keys):
+        try:
+            backend.check_key(key)
+        except ValueError as e:
+            backend.close()
+            raise RuntimeError(f"Key backend '{name}' cannot send key '{key}': {e}")
+    return backend
+
+class KeyEmitter:
+    """Runs backend press/release calls on a dedicated thread.
+
+    The scheduler only appends (kind, key) to a deque (append/popleft are atomic, no lock is
+    taken for the queue itself) and sets a wake-up event, so a slow backend call can never push
+    back the next deadline. A backend call that raises is counted and the first error kept in
+    .error; the thread keeps draining the queue (so releases still go out) and the playback
+    loop stops when it sees .error set.
+    """
+    def __init__(self, backend, telemetry=None):
+        self.backend = backend
+        self.telemetry = telemetry  # Optional TimingTelemetry filled with emit-return times
+        self.error = None  # First backend failure, as a message
+        self.failures = 0
+        self.queue = deque()
+        self._wake = threading.Event()
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='key-emitter', daemon=True)
+        self._thread.start()
+
+    def press(self, key, slot=None):
+        """Queue a press; slot is the action index whose emit time telemetry should record."""
+        self.queue.append((ACTION_PRESS, key, slot))
+        self._wake.set()
+
+    def release(self, key, slot=None):
+        self.queue.append((ACTION_RELEASE, key, slot))
+        self._wake.set()
+
+    def press_many(self, keys, slots=()):
+        """Queue a chord: keys go to the backend as one batch; slots are the members' action indexes."""
+        self.queue.append((ACTION_PRESS, tuple(keys), tuple(slots)))
+        self._wake.set()
+
+    def release_many(self, keys, slots=()):
+        self.queue.append((ACTION_RELEASE, tuple(keys), tuple(slots)))
+        self._wake.set()
+
+    def _run(self):
+        queue = self.queue
+        backend = self.backend
+        perf_counter = time.perf_counter
+        while True:
+            self._wake.wait()
+            self._wake.clear()
+            while queue:
+                kind, key, slot = queue.popleft()
+                try:
+                    if type(key) is tuple:  # Chord
+                        if kind == ACTION_PRESS:
+                            backend.press_many(key)
+                        else:
+                            backend.release_many(key)
+                    elif kind == ACTION_PRESS:
+                        backend.press(key)
+                    else:
+                        backend.release(key)
+                except Exception as e:
+                    self.failures += 1
+                    if self.error is None:
+                        self.error = f"{'press' if kind == ACTION_PRESS else 'release'} {key!r} failed: {e!r}"
+                    continue  # Not emitted, so no emit time for telemetry
+                if type(key) is tuple:
+                    if self.telemetry is not None:
+                        returned = perf_counter()
+                        for member_slot in slot:
+                            self.telemetry.emitted[member_slot] = returned
+                    continue
+                if slot is not None and self.telemetry is not None:
+                    self.telemetry.emitted[slot] = perf_counter()  # When the backend call returned
+            if self._stopping:
+                return
+
+    def close(self):
+        """Emit everything still queued, stop the thread and close the backend."""
+        self._stopping = True
+        self._wake.set()
+        self._thread.join()
+        self.backend.close()
+
+# Latency calibration: presses a harmless key through the chosen backend and times its arrival
+CALIBRATION_KEY = 'shift'
+CALIBRATION_SAMPLES = 20
+
+def calibrate_input_latency(backend_name, logger, samples=CALIBRATION_SAMPLES, key=CALIBRATION_KEY, timeout=0.5):
+    """Measure how long a press takes to reach a local key listener (stand-in for the game).
+
+    The measured path is the one playback uses: emitter queue -> emitter thread -> backend ->
+    OS -> listener. Returns the median in ms, or None if no press arrived. Raises RuntimeError
+    if the backend cannot be created.
+    """
+    backend = create_backend(backend_name)
+    arrived = threading.Event()
+    arrival = [0.0]
+
+    def on_key_down():
+        if not arrived.is_set():
+            arrival[0] = time.perf_counter()
+            arrived.set()
+
+    emitter = KeyEmitter(backend)
+    try:
+        stop_listening = backend.listen(on_key_down)
+    except ImportError as e:
+        emitter.close()
+        raise RuntimeError(f"No key listener for backend '{backend_name}': {e}")
+    latencies = []
+    try:
+        time.sleep(0.2)  # Let the listener settle
+        for _ in range(samples):
+            arrived.clear()
+            requested = time.perf_counter()
+            emitter.press(key)
+            if arrived.wait(timeout):
+                latencies.append((arrival[0] - requested) * 1000.0)
+            emitter.release(key)
+            time.sleep(0.05)
+    finally:
+        stop_listening()
+        emitter.close()
+    if not latencies:
+        logger.log(f"Calibration: no '{key}' press reached the listener in {samples} tries", level=WARNING)
+        return None
+    latencies.sort()
+    logger.log(f"Calibration ({backend_name}): {len(latencies)}/{samples} presses arrived; latency "
+               f"p50={percentile(latencies, 50):.3f} p95={percentile(latencies, 95):.3f} max={latencies[-1]:.3f} ms")
+    return percentile(latencies, 50)
+
+def calibrate_settings(settings, logger, measure=True):
+    """Fill settings' chart_offset_ms / input_latency_ms and the lead_offset_ms they add up to.
+
+    lead_offset_ms is how much earlier than its chart time every action is scheduled: the
+    measured latency minus the chart's own offset (the game plays notes offset ms later).
+    """
+    settings['chart_offset_ms'] = chart_offset_ms(settings['chart_file'])
+    if settings['chart_offset_ms']:
+        logger.log(f"Chart offset file: {settings['chart_offset_ms']:g} ms")
+    if measure:
+        print(f"Calibrating: {CALIBRATION_SAMPLES} '{CALIBRATION_KEY}' presses; don't touch the keyboard...")
+        try:
+            measured = calibrate_input_latency(settings.get('key_backend', 'keyboard'), logger)
+        except RuntimeError as e:
+            logger.log(f"Calibration failed: {e}", level=ERROR)
+            measured = None
+        if measured is not None:
+            settings['input_latency_ms'] = round(measured, 3)
+    settings['lead_offset_ms'] = round(settings.get('input_latency_ms', 0.0) - settings['chart_offset_ms'], 3)
+    logger.log(f"Lead offset: {settings['lead_offset_ms']:g} ms (input latency {settings.get('input_latency_ms', 0.0):g} ms, "
+               f"chart offset {settings['chart_offset_ms']:g} ms)")
+    return settings
+
+# Lateness histogram bucket upper edges in milliseconds (last bucket is open-ended)
+LATENESS_BUCKETS_MS = (0.0, 0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 20.0, 50.0)
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list (0 <= pct <= 100)."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+class TimingTelemetry:
+    """Per-action timing: when it was scheduled, when the scheduler woke for it and when the
+    backend call returned (perf_counter seconds; 0.0 = never happened).
+
+    Slots are action indexes (Action.seq). report() logs lateness percentiles per lane and per
+    section plus a histogram, which is what spin thresholds and backends get tuned against.
+    """
+    def __init__(self, timeline, notes):
+        count = len(timeline.actions)
+        self.actions = timeline.actions
+        self.stats = timeline.stats
+        self.notes = notes
+        self.start_time = 0.0
+        self.pauses = []  # (chart time, seconds): actions from chart time on ran that much later
+        self.woke = array('d', [0.0]) * count
+        self.emitted = array('d', [0.0]) * count
+
+    def grow(self, count):
+        """Make room for slots up to count (streaming adds actions while playing)."""
+        if count > len(self.woke):
+            extra = array('d', [0.0]) * (count - len(self.woke))
+            self.woke.extend(extra)
+            self.emitted.extend(extra)
+
+    def start(self, start_time):
+        self.start_time = start_time
+
+    def restart(self, start_time, actions):
+        """Start over for another pass of a looped region: only that pass's timings are reported.
+
+        Only wake times are cleared; the emitter thread may still be writing the previous pass's
+        emit times, and lateness_ms() skips actions the scheduler has not woken for.
+        """
+        self.start_time = start_time
+        self.pauses = []
+        for action in actions:
+            self.woke[action.seq] = 0.0
+
+    def pause(self, chart_time, seconds):
+        self.pauses.append((chart_time, seconds))
+
+    def record_wake(self, slot, woke):
+        self.woke[slot] = woke
+
+    def lateness_ms(self):
+        """Yield (action, wake lateness ms, emit lateness ms) for every action that was emitted."""
+        start = self.start_time
+        for action in self.actions:
+            emitted = self.emitted[action.seq]
+            if emitted == 0.0 or self.woke[action.seq] == 0.0:
+                continue
+            scheduled = start + action.time
+            for chart_time, seconds in self.pauses:
+                if action.time >= chart_time:
+                    scheduled += seconds
+            yield action, (self.woke[action.seq] - scheduled) * 1000.0, (emitted - scheduled) * 1000.0
+
+    @staticmethod
+    def _summary(values):
+        values = sorted(values)
+        return (f"n={len(values)} p50={percentile(values, 50):.3f} p95={percentile(values, 95):.3f} "
+                f"p99={percentile(values, 99):.3f} max={values[-1] if values else 0.0:.3f} ms")
+
+    def report(self, logger):
+        """Log lateness (scheduled -> emitted) per lane, per section and as a histogram."""
+        rows = list(self.lateness_ms())
+        if not rows:
+            logger.log("Timing telemetry: no actions were emitted.")
+            return
+        logger.log(f"Timing telemetry, wake lateness (scheduled -> scheduler woke): {self._summary(r[1] for r in rows)}")
+        logger.log(f"Timing telemetry, emit lateness (scheduled -> backend returned): {self._summary(r[2] for r in rows)}")
+        by_lane = {}
+        by_section = {}
+        lane_presses = {}  # lane -> emit times of its presses (achieved note rate)
+        emit_costs = []  # scheduler woke -> backend returned, ms
+        for action, wake_late, emit_late in rows:
+            by_lane.setdefault(action.lane, []).append(emit_late)
+            section = self.notes.section[action.note_index] if action.note_index >= 0 else -1  # Events have none
+            by_section.setdefault(section, []).append(emit_late)
+            emit_costs.append(emit_late - wake_late)
+            if action.kind == ACTION_PRESS:
+                lane_presses.setdefault(action.lane, []).append(self.emitted[action.seq])
+        for lane in sorted(by_lane):
+            label = f"lane {lane}" if lane != EVENT_LANE else "events"
+            logger.log(f"  {label}: {self._summary(by_lane[lane])}, "
+                       f"peak {peak_rate(sorted(lane_presses.get(lane, [])))} presses/s")
+        # What this backend can keep up with: one lane is bounded by hold + gap, all lanes
+        # together by the emitter thread doing two backend calls (press + release) per note
+        emit_costs.sort()
+        cost = percentile(emit_costs, 50)
+        lane_max = self.stats.get('lane_max_nps', 1.0 / (MIN_HOLD_DEFAULT + RELEASE_GAP_DEFAULT))
+        total_max = f"{1000.0 / (2 * cost):.0f}" if cost > 0 else "unbounded"
+        logger.log(f"Sustainable NPS with this backend: {lane_max:.0f} per lane (hold + gap), "
+                   f"{total_max} across all lanes (p50 emit cost {cost:.3f} ms)")
+        for section in sorted(by_section):
+            label = f"section {section}" if section >= 0 else "no section"
+            logger.log(f"  {label}: {self._summary(by_section[section])}")
+        counts = [0] * (len(LATENESS_BUCKETS_MS) + 1)
+        for _, _, emit_late in rows:
+            bucket = 0
+            while bucket < len(LATENESS_BUCKETS_MS) and emit_late > LATENESS_BUCKETS_MS[bucket]:
+                bucket += 1
+            counts[bucket] += 1
+        logger.log("Emit lateness histogram:")
+        lower = None
+        for bucket, count in enumerate(counts):
+            upper = LATENESS_BUCKETS_MS[bucket] if bucket < len(LATENESS_BUCKETS_MS) else None
+            if lower is None:
+                label = f"<= {upper:g} ms (early/on time)"
+            elif upper is None:
+                label = f"> {lower:g} ms"
+            else:
+                label = f"{lower:g}-{upper:g} ms"
+            logger.log(f"  {label:>24}: {count:6d} {'#' * min(60, count * 60 // len(rows))}")
+            lower = upper
+
+START_STOP_KEY = 't'  # First press starts playback, the next one stops it
+
+class PlaybackHotkeys:
+    """Start/stop/pause keys driven by keyboard hook callbacks instead of polling is_pressed().
+
+    Each key-down is stamped with time.perf_counter() (the scheduler's clock) inside the hook,
+    so playback starts at the key-down itself rather than at the next poll. The playback loop
+    only tests threading.Event flags. Auto-repeat while a key is held is ignored, so holding
+    'T' after starting does not stop playback. pause_key (preset "pause_key") is optional;
+    it toggles a pause during which no actions run.
+    """
+    def __init__(self, start_stop_key=START_STOP_KEY, pause_key=None, clock=time.perf_counter):
+        self.start_stop_key = start_stop_key
+        self.pause_key = pause_key
+        self.clock = clock
+        self.started = threading.Event()
+        self.stopped = threading.Event()
+        self.paused = threading.Event()
+        self.changed = threading.Event()  # Set on every hotkey press (wakes wait_for_resume)
+        self.start_time = None
+        self.pause_time = None
+        self.resume_time = None
+        self.down = set()  # Hotkeys currently held, to drop auto-repeat key-downs
+        self.hooks = []
+
+    def install(self):
+        """Hook the hotkeys. Raises RuntimeError if the keyboard module is missing."""
+        try:
+            import keyboard as keyboard_module  # pip install keyboard
+        except ImportError:
+            raise RuntimeError("Please install the 'keyboard' module: pip install keyboard")
+        self.keyboard = keyboard_module
+        for key in (self.start_stop_key, self.pause_key):
+            if key:
+                self.hooks.append(keyboard_module.hook_key(key, lambda event, key=key: self.on_event(key, event.event_type)))
+
+    def uninstall(self):
+        for hook in self.hooks:
+            self.keyboard.unhook(hook)
+        self.hooks = []
+
+    def on_event(self, key, event_type):
+        """Hook callback: record the key-down time first, then update the flags."""
+        now = self.clock()
+        if event_type != 'down':
+            self.down.discard(key)
+            return
+        if key in self.down:
+            return  # Auto-repeat
+        self.down.add(key)
+        if key == self.start_stop_key:
+            if not self.started.is_set():
+                self.start_time = now
+                self.started.set()
+            else:
+                self.stopped.set()
+        elif self.started.is_set():
+            if self.paused.is_set():
+                self.resume_time = now
+                self.paused.clear()
+            else:
+                self.pause_time = now
+                self.paused.set()
+        self.changed.set()
+
+    def wait_for_resume(self):
+        """Block while paused. Returns the resume time, or None if stop was pressed instead."""
+        while self.paused.is_set() and not self.stopped.is_set():
+            self.changed.wait()
+            self.changed.clear()
+        return None if self.stopped.is_set() else self.resume_time
+
+def wait_for_t(hotkeys):
+    """Block until the user presses 'T' to begin playback.
+    Returns the perf_counter timestamp of the key-down event."""
     print("Press 'T' to start...")
-    while True:
-        if keyboard.is_pressed('t'):
-            print("Starting!")
-            # Wait for 'T' to be released before continuing
-            while keyboard.is_pressed('t'):
-                time.sleep(0.05)
-            # Set start time exactly when T is pressed
-            return time.time()
-        time.sleep(0.1)
-
-def main():
-    """Entry point: gather settings, parse chart, then run playback loop."""
-    log_path = get_log_file()
-    logger = Logger(log_path)
-    logger.log("Script started.")
-    settings = ask_user(logger)
-    # If loaded from preset, chart_class will be a string, so convert to class
+    hotkeys.started.wait()
+    print("Starting!")
+    return hotkeys.start_time
+
+# Headless benchmark over the bundled example charts
+CHART_TYPES_DIR = os.path.join(os.path.dirname(__file__), 'Chart Types')
+BENCH_DIR = os.path.join(os.path.dirname(__file__), 'Benchmarks')
+BENCH_READERS = {
+    # Chart Types sub-folder -> reader used for every .json inside it
+    'FNF': FNFChartReader,
+    'Matt': MattChartReader,
+    'Dustin': DustinChartReader,
+    'Doors': DoorsChartReader,
+}
+# Fixed settings so compile/playback numbers are comparable between versions
+BENCH_SETTINGS = {
+    'lanes': [0, 1, 2, 3],
+    'opponent_lanes': [4, 5, 6, 7],
+    'controls': {0: 'a', 1: 's', 2: 'k', 3: 'l', 4: 'a', 5: 's', 6: 'k', 7: 'l'},
+    'special_note_settings': {},
+    'print_presses': False,
+}
+BENCH_FIELDS = ('group', 'file', 'reader', 'difficulty', 'bytes', 'notes', 'actions', 'parse_ms',
+                'normalize_ms', 'compile_ms', 'playback_ms', 'simulated_s', 'emitted', 'status')
+
+def corpus_charts(root):
+    """(group, reader class, path) for every .json under root's BENCH_READERS sub-folders, sorted."""
+    for group, reader_class in BENCH_READERS.items():
+        group_dir = os.path.join(root, group)
+        if not os.path.isdir(group_dir):
+            continue
+        for dirpath, _, filenames in sorted(os.walk(group_dir)):
+            for name in sorted(filenames):
+                if name.lower().endswith('.json'):
+                    yield group, reader_class, os.path.join(dirpath, name)
+
+def _best_of(repeat, func):
+    """Run func repeat times; return (last result, fastest wall time in ms)."""
+    best = None
+    result = None
+    for _ in range(max(1, repeat)):
+        started = time.perf_counter()
+        result = func()
+        elapsed = (time.perf_counter() - started) * 1000.0
+        best = elapsed if best is None else min(best, elapsed)
+    return result, best
+
+def simulate_playback(timeline, trace=None):
+    """Replay a compiled timeline in simulated time against a NullBackend.
+
+    Returns (simulated song seconds, emitted events). No real sleeping happens, so the wall time
+    of this call is the scheduler's own overhead. A trace list is filled with the run's
+    format_trace() lines.
+    """
+    clock = VirtualClock()
+    backend = NullBackend(clock)
+    def execute(action, now):
+        if action.chord:
+            keys = tuple(dict.fromkeys(member.key for member in action.chord))
+            if action.kind == ACTION_PRESS:
+                backend.press_many(keys)
+            else:
+                backend.release_many(keys)
+        elif action.kind == ACTION_PRESS:
+            backend.press(action.key)
+        else:
+            backend.release(action.key)
+    scheduler = PlaybackScheduler(timeline.steps, spin_threshold=0.0, clock=clock, sleep=clock.sleep)
+    scheduler.run(clock(), execute)
+    if trace is not None:
+        trace.extend(format_trace(backend.events))
+    return clock(), len(backend.events)
+
+# Playback traces: one line per key event a simulated run emitted, "<seconds> <press|release> <key>".
+# The virtual clock lands exactly on each deadline, so the same chart, settings and code always
+# give the same trace, and a changed line pinpoints a changed press.
+TRACE_HEADER = '# fnf playback trace v1: time_s kind key'
+
+def format_trace(events):
+    """Trace lines for NullBackend events (header first)."""
+    return [TRACE_HEADER] + [f"{at:.6f} {kind} {key}" for at, kind, key in events]
+
+def write_trace(path, lines):
+    folder = os.path.dirname(path)
+    if folder and not os.path.exists(folder):
+        os.makedirs(folder)
+    with open(path, 'w', encoding='utf-8', newline='\n') as f:
+        f.write('\n'.join(lines) + '\n')
+
+def read_trace(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read().splitlines()
+
+def diff_traces(expected, actual):
+    """None if two traces match, else a short description of the first difference."""
+    if expected == actual:
+        return None
+    for line, (want, got) in enumerate(zip(expected, actual), 1):
+        if want != got:
+            return f"line {line}: expected '{want}', got '{got}' ({len(expected)} vs {len(actual)} lines)"
+    return f"{len(expected)} expected lines, {len(actual)} actual (one is a prefix of the other)"
+
+# Golden traces shipped with the script (FNF/Golden): a few charts per reader and file format,
+# picked for what they exercise. "--golden" with no DIR replays exactly these and fails on any change.
+GOLDEN_DIR = os.path.join(os.path.dirname(__file__), 'Golden')
+GOLDEN_CHARTS = (
+    'FNF/2hot/2hot-chart.json',                    # base game v2, easy/normal/hard
+    'FNF/philly-nice/philly-nice-chart-erect.json',  # erect/nightmare plus an empty difficulty; sanitized
+    'FNF/2hot/2hot-metadata.json',                 # metadata file: no notes
+    'FNF/test/test.json',                          # unknown format
+    'Matt/battlefield/battlefield-hard.json',      # string special note types
+    'Matt/halfpipe/halfpipe-hard.json',            # sanitizer drops stacked duplicates
+    'Matt/five-hot/five-hot-hard.json',            # shortened holds, dropped duplicates, chords
+    'Matt/3hot/events.json',                       # events file: no notes
+    'Dustin/drowning/drowning-hard.json',          # int note types
+    'Dustin/cringe/cringe-hard.json',              # many jacks into sustains
+    'Dustin/red-megalovania/red-megalovania (1).json',  # sanitized; shortened hold
+    'Doors/bargain/bargain-hard.json',             # empty-string types, trailing [] extras
+    'Doors/bargain/bargain.json',                  # Matt-shaped notes in a Doors folder
+    'Doors/eye-spy-hell/eye-spy-hell.json',        # large Doors chart
+)
+
+def run_golden_traces(golden_dir, root=CHART_TYPES_DIR, update=False, charts=None):
+    """Simulate every chart under root and diff its trace against golden_dir.
+
+    Charts go through the normal pipeline (ChartDocument, sanitizer, compile_timeline with
+    BENCH_SETTINGS) and are replayed on a VirtualClock. Missing golden traces are written;
+    with update, differing ones are overwritten too. charts limits the run to those paths
+    (relative to root, '/'-separated); then a missing trace (or chart) is a failure rather than
+    written, unless update is set. Returns {'match', 'new', 'differ', 'missing', 'error'} counts.
+    """
+    counts = dict.fromkeys(('match', 'new', 'differ', 'missing', 'error'), 0)
+    started = time.perf_counter()
+    wanted = None if charts is None else set(charts)
+    for group, reader_class, path in corpus_charts(root):
+        rel = os.path.relpath(path, root)
+        if wanted is not None:
+            if rel.replace(os.sep, '/') not in wanted:
+                continue
+            wanted.discard(rel.replace(os.sep, '/'))
+        try:
+            document = ChartDocument(path, reader_class)
+        except Exception as e:
+            print(f"ERROR {rel}: {type(e).__name__}: {e}")
+            counts['error'] += 1
+            continue
+        for difficulty in document.difficulties or [None]:
+            label = rel if difficulty is None else f"{rel} ({difficulty})"
+            golden_path = os.path.join(golden_dir, rel + (f'.{difficulty}' if difficulty else '') + '.trace')
+            timeline = compile_timeline(document.table_for(difficulty), BENCH_SETTINGS, reader_class)
+            trace = []
+            simulate_playback(timeline, trace)
+            if not os.path.exists(golden_path):
+                if charts is not None and not update:
+                    print(f"MISSING {label}: no golden trace {golden_path}")
+                    counts['missing'] += 1
+                    continue
+                write_trace(golden_path, trace)
+                counts['new'] += 1
+                continue
+            difference = diff_traces(read_trace(golden_path), trace)
+            if difference is None:
+                counts['match'] += 1
+                continue
+            counts['differ'] += 1
+            print(f"DIFF {label}: {difference}")
+            if update:
+                write_trace(golden_path, trace)
+    for rel in sorted(wanted or ()):
+        print(f"MISSING {rel}: chart not found under {root}")
+        counts['missing'] += 1
+    print(f"Golden traces: {counts['match']} match, {counts['differ']} differ{' (updated)' if update and counts['differ'] else ''}, "
+          f"{counts['new']} new, {counts['missing']} missing, {counts['error']} unreadable "
+          f"({time.perf_counter() - started:.1f} s) -> {golden_dir}")
+    return counts
+
+def bench_chart(group, reader_class, path, root, repeat):
+    """Benchmark one chart file: parse, normalize, compile and simulated playback (one row per difficulty)."""
+    base = {'group': group, 'file': os.path.relpath(path, root), 'reader': reader_class.__name__,
+            'bytes': os.path.getsize(path)}
+    reader = reader_class(path)
+    try:
+        data, parse_ms = _best_of(repeat, reader.read_json)
+    except Exception as e:
+        return [dict(base, difficulty=None, status=f"error: {e}")]
+    difficulties = [None]
+    if reader_class is FNFChartReader and isinstance(data, dict) and isinstance(data.get('notes'), dict):
+        difficulties = list(data['notes'].keys())
+    rows = []
+    for difficulty in difficulties:
+        row = dict(base, difficulty=difficulty, parse_ms=parse_ms)
+        try:
+            normalize_args = (data, difficulty) if reader_class is FNFChartReader else (data,)
+            _, row['normalize_ms'] = _best_of(repeat, lambda: reader.normalize(*normalize_args))
+            notes = reader.get_notes()
+            timeline, row['compile_ms'] = _best_of(repeat, lambda: compile_timeline(notes, BENCH_SETTINGS, reader_class))
+            (simulated_s, emitted), row['playback_ms'] = _best_of(repeat, lambda: simulate_playback(timeline))
+            row.update(notes=len(notes), actions=len(timeline), simulated_s=simulated_s, emitted=emitted,
+                       status='ok' if len(notes) else 'no-notes')
+        except Exception as e:
+            row['status'] = f"error: {type(e).__name__}: {e}"
+        rows.append(row)
+    return rows
+
+def bench_json_decoders(root, repeat):
+    """Time every installed JSON decoder on every .json under root (read + parse, fastest run).
+
+    'read+json' is the plain open().read() + json.loads path for comparison; the others read
+    through read_chart_buffer(). Returns {decoder: {'files', 'bytes', 'ms', 'errors'}}.
+    """
+    def plain_read(path):
+        with open(path, 'rb') as f:
+            return json.loads(f.read())
+    paths = sorted(os.path.join(dirpath, name) for dirpath, _, filenames in os.walk(root)
+                   for name in filenames if name.lower().endswith('.json'))
+    decoders = {'read+json': plain_read}
+    for name in JSON_DECODERS:
+        loads = json_decoder(name)
+        if loads is not None:
+            decoders[name] = lambda path, loads=loads: loads(read_chart_buffer(path))
+    totals = {}
+    for name, decode in decoders.items():
+        total = totals[name] = {'files': 0, 'bytes': 0, 'ms': 0.0, 'errors': 0}
+        for path in paths:
+            try:
+                _, elapsed = _best_of(repeat, lambda: decode(path))
+            except ValueError:
+                total['errors'] += 1
+                continue
+            total['files'] += 1
+            total['bytes'] += os.path.getsize(path)
+            total['ms'] += elapsed
+    return totals
+
+def run_benchmark(root=CHART_TYPES_DIR, out_path=None, repeat=3):
+    """Benchmark every reader over a Chart Types style folder and write JSON + CSV reports."""
+    import csv
+    import platform
+    rows = []
+    started = time.perf_counter()
+    for group, reader_class, path in corpus_charts(root):
+        rows.extend(bench_chart(group, reader_class, path, root, repeat))
+    totals = {}
+    for row in rows:
+        total = totals.setdefault(row['reader'], {'files': 0, 'notes': 0, 'parse_ms': 0.0, 'normalize_ms': 0.0,
+                                                  'compile_ms': 0.0, 'playback_ms': 0.0, 'errors': 0})
+        total['files'] += 1
+        total['errors'] += row['status'].startswith('error')
+        for field in ('notes', 'parse_ms', 'normalize_ms', 'compile_ms', 'playback_ms'):
+            total[field] += row.get(field) or 0
+    json_totals = bench_json_decoders(root, repeat)
+    report = {
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'json_decoder': next(name for name in JSON_DECODERS if json_decoder(name) is not None),
+        'numpy': load_numpy().__version__ if load_numpy() is not None else None,
+        'root': os.path.abspath(root),
+        'repeat': repeat,
+        'wall_s': time.perf_counter() - started,
+        'totals': totals,
+        'json_decoders': json_totals,
+        'rows': rows,
+    }
+    if out_path is None:
+        if not os.path.exists(BENCH_DIR):
+            os.makedirs(BENCH_DIR)
+        out_path = os.path.join(BENCH_DIR, f"bench_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}")
+    stem = os.path.splitext(out_path)[0]
+    with open(stem + '.json', 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    with open(stem + '.csv', 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=BENCH_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    for reader_name, total in totals.items():
+        print(f"{reader_name}: {total['files']} file rows, {total['notes']} notes, parse {total['parse_ms']:.1f} ms, "
+              f"normalize {total['normalize_ms']:.1f} ms, compile {total['compile_ms']:.1f} ms, "
+              f"playback {total['playback_ms']:.1f} ms, {total['errors']} error(s)")
+    for name, total in json_totals.items():
+        print(f"JSON {name}: {total['files']} files, {total['bytes'] / 1e6:.1f} MB in {total['ms']:.1f} ms "
+              f"({total['bytes'] / 1e3 / total['ms'] if total['ms'] else 0.0:.0f} MB/s), {total['errors']} error(s)")
+    print(f"Benchmark report written to {stem}.json and {stem}.csv ({report['wall_s']:.1f} s)")
+    return report
+
+SANITIZE_REPORT_FIELDS = ('group', 'file', 'reader', 'difficulty', 'notes') + SANITIZE_FIELDS + (
+    'kept', 'presses_before', 'presses_after', 'actions_saved', 'status')
+
+def run_sanitize_report(root=CHART_TYPES_DIR, out_path=None):
+    """Sanitize every chart under a Chart Types style folder and write what was removed (JSON + CSV).
+
+    Each chart is compiled with BENCH_SETTINGS before and after sanitizing, so the report also
+    shows how many key events the sanitizer saves beyond what the timeline compiler already drops.
+    """
+    import csv
+    rows = []
+    started = time.perf_counter()
+    for group, reader_class, path in corpus_charts(root):
+        base = {'group': group, 'file': os.path.relpath(path, root), 'reader': reader_class.__name__}
+        reader = reader_class(path)
+        try:
+            data = reader.read_json()
+        except Exception as e:
+            rows.append(dict(base, difficulty=None, status=f"error: {e}"))
+            continue
+        difficulties = [None]
+        if reader_class is FNFChartReader and isinstance(data, dict) and isinstance(data.get('notes'), dict):
+            difficulties = list(data['notes'].keys())
+        for difficulty in difficulties:
+            row = dict(base, difficulty=difficulty)
+            try:
+                reader.normalize(*((data, difficulty) if reader_class is FNFChartReader else (data,)))
+                notes = reader.get_notes()
+                clean, report = sanitize_notes(notes)
+                before = compile_timeline(notes, BENCH_SETTINGS, reader_class)
+                after = compile_timeline(clean, BENCH_SETTINGS, reader_class)
+                row.update(report, notes=len(notes), presses_before=before.stats['presses'],
+                           presses_after=after.stats['presses'], actions_saved=len(before) - len(after),
+                           status='ok' if len(notes) else 'no-notes')
+            except Exception as e:
+                row['status'] = f"error: {type(e).__name__}: {e}"
+            rows.append(row)
+    totals = {field: sum(row.get(field) or 0 for row in rows)
+              for field in ('notes',) + SANITIZE_FIELDS + ('kept', 'presses_before', 'presses_after', 'actions_saved')}
+    totals['charts'] = len(rows)
+    totals['changed'] = sum(1 for row in rows if any(row.get(field) for field in SANITIZE_FIELDS))
+    report = {
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'root': os.path.abspath(root),
+        'tolerance_ms': SANITIZE_TOLERANCE * 1000.0,
+        'wall_s': time.perf_counter() - started,
+        'totals': totals,
+        'rows': rows,
+    }
+    if out_path is None:
+        if not os.path.exists(BENCH_DIR):
+            os.makedirs(BENCH_DIR)
+        out_path = os.path.join(BENCH_DIR, f"sanitize_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}")
+    stem = os.path.splitext(out_path)[0]
+    with open(stem + '.json', 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    with open(stem + '.csv', 'w', encoding='utf-8', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=SANITIZE_REPORT_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+    for row in rows:
+        if any(row.get(field) for field in SANITIZE_FIELDS):
+            print(f"{row['file']} ({row['difficulty'] or 'default'}): {sanitize_summary(row)}; "
+                  f"{row['presses_before'] - row['presses_after']} presses, {row['actions_saved']} key events saved")
+    print(f"Sanitized {totals['charts']} charts ({totals['changed']} changed): {sanitize_summary(totals)}; "
+          f"presses {totals['presses_before']} -> {totals['presses_after']}, {totals['actions_saved']} key events saved")
+    print(f"Sanitize report written to {stem}.json and {stem}.csv ({report['wall_s']:.1f} s)")
+    return report
+
+def parse_args(argv=None):
+    """Command line options (all optional; without any the interactive prompts run)."""
+    import argparse
+    parser = argparse.ArgumentParser(description="Automated FNF chart player.")
+    parser.add_argument('--bench', nargs='?', const=CHART_TYPES_DIR, metavar='ROOT',
+                        help="benchmark every reader over a chart folder (default: Chart Types) and exit")
+    parser.add_argument('--bench-out', metavar='PATH', help="report path; .json and .csv are both written")
+    parser.add_argument('--bench-repeat', type=int, default=3, metavar='N', help="runs per phase, fastest kept (default 3)")
+    parser.add_argument('--sanitize-report', nargs='?', const=CHART_TYPES_DIR, metavar='ROOT',
+                        help="sanitize every chart under a folder (default: Chart Types), report what was removed and exit")
+    parser.add_argument('--index', nargs='*', metavar='ROOT',
+                        help="update the chart catalog from these folders (default: Chart Types) and exit")
+    parser.add_argument('--index-workers', type=int, metavar='N', help="indexer processes (default: CPU count)")
+    parser.add_argument('--calibrate', metavar='PRESET',
+                        help="measure the preset's key backend latency, save its lead offset and exit")
+    parser.add_argument('--preset', metavar='NAME', help="play this preset without the prompts")
+    parser.add_argument('--chart', metavar='PATH',
+                        help="play this chart without the prompts (the preset's, or default arrow-key settings)")
+    parser.add_argument('--type', choices=['auto'] + sorted(CHART_TYPE_NAMES), type=str.lower,
+                        help="chart reader for --chart (default: auto, sniffed from the file)")
+    parser.add_argument('--difficulty', help="difficulty for base-game charts (default: first one listed)")
+    parser.add_argument('--playlist', nargs='+', metavar='ITEM',
+                        help="play presets / chart paths (or .txt lists of them) back to back, loading the next one "
+                             "in the background")
+    start = parser.add_mutually_exclusive_group()
+    start.add_argument('--from', dest='seek_from', type=parse_chart_time, metavar='TIME',
+                       help="start at this chart time: 83.5, 83.5s, 83500ms or 1:23.5")
+    start.add_argument('--from-section', type=int, metavar='N', help="start at the first note of section N")
+    end = parser.add_mutually_exclusive_group()
+    end.add_argument('--to', dest='seek_to', type=parse_chart_time, metavar='TIME', help="stop at this chart time")
+    end.add_argument('--to-section', type=int, metavar='N', help="stop after section N")
+    parser.add_argument('--loop', action='store_true',
+                        help="repeat the --from/--to region (default: the whole song) until T is pressed")
+    parser.add_argument('--trace', metavar='PATH', help="with --dry-run, write every simulated key event to this file")
+    parser.add_argument('--golden', nargs='?', const=GOLDEN_DIR, metavar='DIR',
+                        help="replay charts on a virtual clock, diff their traces and exit (status 1 on any "
+                             "difference). Without DIR: the bundled Golden set. With DIR: every chart in "
+                             "Chart Types (missing traces are written)")
+    parser.add_argument('--golden-update', action='store_true', help="with --golden, overwrite traces that differ")
+    parser.add_argument('--dry-run', action='store_true',
+                        help="load and compile, replay in simulated time without sending keys, then exit")
+    return parser.parse_args(argv)
+
+def resolve_chart_class(settings):
+    """Reader class for settings['chart_class'], which presets store as a class name string."""
     chart_class_obj = settings['chart_class']
     if isinstance(chart_class_obj, str):
         # Find the class from chart_types
@@ -426,115 +3345,451 @@ def main():
             if v[1].__name__ == chart_class_obj:
                 chart_class_obj = v[1]
                 break
+    return chart_class_obj
 
+# A chart loaded and compiled ahead of playback (by play_song itself or the playlist prefetcher)
+PreparedChart = namedtuple('PreparedChart', 'reader notes timeline')
+
+def prepare_chart(settings, chart_class_obj, logger, cache=None, document=None, between_steps=None,
+                  slice_notes=COMPILE_SLICE_NOTES):
+    """Load (through the chart cache) and compile one chart. Returns a PreparedChart.
+
+    between_steps and slice_notes are passed on to the chart load and to compile_timeline (the
+    prefetcher throttles itself with them).
+    """
     reader = chart_class_obj(settings['chart_file'])  # Instantiate appropriate chart reader
-    if chart_class_obj == FNFChartReader:
-        reader.load_chart(settings.get('difficulty'), logger=logger)
-    else:
-        reader.load_chart()
-    notes = reader.get_notes()  # Normalized list of note dicts
+    load_chart_cached(reader, settings.get('difficulty'), logger=logger, cache=cache, document=document,
+                      between_steps=between_steps, slice_notes=slice_notes)
+    if cache is not None:
+        logger.log(f"Chart cache: {cache.hits} hit(s), {cache.misses} miss(es)")
+    notes = reader.get_notes()  # Normalized columnar note table
     logger.log(f"Loaded {len(notes)} notes from chart.")
     if len(notes) > 0:
         logger.log("First 10 notes:")
         for n in notes[:10]:
             logger.log(str(n))
-    # Get the exact start time when T is pressed
-    start_time = wait_for_t()
-    logger.log("Playback started.")
+    # Events (events.json, modchart.xml, scripts) are only read when the preset handles some
+    events = None
+    keys = event_keys(settings)
+    if keys:
+        started = time.perf_counter()
+        try:
+            # Reuse the JSON the notes were parsed from; only a cache hit reads the file again
+            data = reader.document.data if reader.document is not None else None
+            chart_events = load_chart_events(settings['chart_file'], logger, data)
+        except Exception as e:
+            logger.log(f"Events: could not load events for {settings['chart_file']} ({e}); playing without them", level=ERROR)
+            chart_events = []
+        events = compile_events(chart_events, keys, settings)
+        logger.log(f"Events: {len(chart_events)} read, {len(events) // 2} handled by {keys} "
+                   f"({(time.perf_counter() - started) * 1000.0:.1f} ms)")
+        bound = set(settings['controls'].values()) & set(keys.values())
+        if bound:
+            logger.log(f"Events: {sorted(bound)} also bound to a lane; event and note presses may overlap", level=WARNING)
+    # Resolve every per-note decision before playback so the loop only walks actions
+    timeline = compile_timeline(notes, settings, chart_class_obj, logger, between_steps=between_steps,
+                                slice_notes=slice_notes, events=events)
+    return PreparedChart(reader, notes, timeline)
+
+def play_song(settings, logger, dry_run=False, interactive=False, prepared=None, prefetch=None, seek=None, trace=None):
+    """Load, compile and play one chart: wait for T, run the scheduler, report telemetry.
 
-    note_idx = 0
-    total_notes = len(notes)
-    stopped = False
-    while keyboard.is_pressed('t'):
-        time.sleep(0.05)
-
-    held_notes = {}  # lane -> (release_timestamp, key_string)
-    base_player_lanes = settings['lanes']
-    base_opponent_lanes = settings.get('opponent_lanes', [])
-    # Default to True for Matt even if missing in preset
-    swap_by_must_hit = settings.get('swap_by_must_hit', chart_class_obj in (MattChartReader, DoorsChartReader))
-    if chart_class_obj in (MattChartReader, DoorsChartReader):
+    prepared skips loading and compiling (the playlist prefetcher already did it). prefetch,
+    if given, is a PrefetchWorker that is told about this song's scheduler so it only works
+    in the gaps between deadlines. seek (a SeekRequest) plays only part of the chart, looped
+    until T if seek.loop is set. trace is a path the dry run writes its playback trace to.
+    """
+    song_started = time.perf_counter()
+    prefetched = prepared is not None
+    if dry_run:
+        settings['key_backend'] = 'null'  # Nothing reaches the game
+        settings['stream'] = False
+    logger.set_level(settings.get('log_level', 'INFO'))
+    # If loaded from preset, chart_class will be a string, so convert to class
+    chart_class_obj = resolve_chart_class(settings)
+    # Compiled chart cache (content hash + reader + difficulty); presets may turn it off with "use_cache": false
+    cache = ChartCache(logger=logger) if settings.get('use_cache', True) else None
+    # Reuse the chart ask_user already parsed (if it matches), so the file is read once per run
+    document = settings.pop('document', None)
+    if document is not None and (document.path != settings['chart_file'] or document.reader_class is not chart_class_obj):
+        document = None
+    # Streaming ("stream": true) parses sections while playing instead of loading the chart up front
+    stream = (settings.get('stream', False) and chart_class_obj.SECTIONED and document is None and prepared is None
+              and seek is None and not event_keys(settings))  # Seeking and events need the whole timeline
+    if stream:
+        reader = chart_class_obj(settings['chart_file'])
+        notes = NoteTable()  # Filled as sections arrive; the chart JSON is never held whole
+        stream_stats = {}
+        logger.log(f"Streaming chart sections (window {STREAM_WINDOW_SECTIONS} sections, "
+                   f"lookahead {STREAM_LOOKAHEAD:.1f} s); chart cache not used")
+    if settings.get('lead_offset_ms'):
+        logger.log(f"Lead offset: actions scheduled {settings['lead_offset_ms']:g} ms ahead of chart time "
+                   f"(input latency {settings.get('input_latency_ms', 0.0):g} ms, chart offset {settings.get('chart_offset_ms', 0.0):g} ms)")
+    if chart_class_obj.SECTIONED:
+        swap_by_must_hit = settings.get('swap_by_must_hit', True)
         logger.log(f"{chart_class_obj.__name__} lane strategy: mustHitSection swap enforced (swap_by_must_hit={swap_by_must_hit})")
+    if stream:
+        compiler = TimelineCompiler(settings, chart_class_obj, logger)
+        timeline = CompiledTimeline([], compiler.stats)  # Actions are appended as they are compiled
+    else:
+        if prepared is None:
+            prepared = prepare_chart(settings, chart_class_obj, logger, cache=cache, document=document)
+        reader, notes, timeline = prepared
+    actions = timeline.actions
+    region = None
+    if seek is not None:
+        seek_started = time.perf_counter()
+        try:
+            start, end = resolve_seek(seek, notes)
+        except ValueError as e:
+            logger.log(f"Cannot seek: {e}", level=ERROR)
+            return
+        region = seek_region(timeline, start, end, settings.get('lead_offset_ms', 0.0) / 1000.0,
+                             settings.get('release_gap_ms', RELEASE_GAP_DEFAULT * 1000.0) / 1000.0,
+                             settings.get('chord_epsilon_ms', CHORD_EPSILON_DEFAULT * 1000.0) / 1000.0)
+        logger.log(f"Seek: chart {region.start:.3f} s to {region.end:.3f} s{' (looped)' if seek.loop else ''}, "
+                   f"{len(region.steps)} scheduler steps; {region.held} held sustains pressed again at the start, "
+                   f"{region.released} keys released at the end; found in {(time.perf_counter() - seek_started) * 1000.0:.2f} ms")
+        if seek.loop and not region.steps:
+            # An empty pass returns at once, so looping it would spin until T
+            logger.log("Seek: nothing to press in the region; playing it once instead of looping", level=WARNING)
+            seek = seek._replace(loop=False)
+        timeline = CompiledTimeline(actions, timeline.stats, region.steps)
+    if dry_run:
+        replay_start = time.perf_counter()
+        trace_lines = [] if trace else None
+        simulated, emitted = simulate_playback(timeline, trace_lines)
+        if trace:
+            write_trace(trace, trace_lines)
+            logger.log(f"Dry run trace: {emitted} key events written to {trace}")
+        logger.log(f"Dry run: ready {(replay_start - LAUNCHED_AT) * 1000.0:.0f} ms after launch; "
+                   f"{emitted} key events over {simulated:.2f} s of chart time replayed in "
+                   f"{(time.perf_counter() - replay_start) * 1000.0:.1f} ms, no keys sent")
+        return
 
-    while note_idx < total_notes and not stopped:
-        now = time.time() - start_time  # Elapsed seconds since playback start
+    # Key emission runs on its own thread through the backend chosen in the preset
+    backend_name = settings.get('key_backend', 'keyboard')
+    telemetry = TimingTelemetry(timeline, notes)
+    if region is not None:
+        telemetry.actions = region.actions  # Re-pressed sustains and end releases are timed at their new times
+    try:
+        # Every key playback can send, so an unsendable binding fails here rather than mid-song
+        sent_keys = list(settings['controls'].values()) + list(event_keys(settings).values())
+        emitter = KeyEmitter(create_backend(backend_name, sent_keys), telemetry)
+    except RuntimeError as e:
+        logger.log(str(e), level=ERROR)
+        return
+    logger.log(f"Key backend: {backend_name}")
 
-        # Determine which sustained notes should be released at this tick
-        lanes_to_release = [lane for lane, (release_time, key) in held_notes.items() if now >= release_time]
-        for lane in lanes_to_release:
-            key = held_notes[lane][1]
-            keyboard.release(key)
-            if settings['print_presses']:
-                logger.log(f"Released: {key} (lane {lane}, time {now:.3f})")
-            del held_notes[lane]
+    spin_threshold = settings.get('spin_threshold_ms', SPIN_THRESHOLD_DEFAULT * 1000.0) / 1000.0
+    scheduler = PlaybackScheduler([] if stream else timeline.steps, spin_threshold=spin_threshold)
+    if stream:
+        chord_epsilon = settings.get('chord_epsilon_ms', CHORD_EPSILON_DEFAULT * 1000.0) / 1000.0
 
-        # Pressing 't' during playback aborts prematurely
-        if keyboard.is_pressed('t'):
-            logger.log("Stopped!")
-            stopped = True
-            break
+        sanitized = dict.fromkeys(SANITIZE_FIELDS, 0)
+
+        def action_batches():
+            """Parse, merge, sanitize and compile the chart section by section as the scheduler asks for more."""
+            for batch in stream_chart_notes(reader, stats=stream_stats):
+                batch, report = sanitize_notes(batch)  # Per batch: stacks split across two batches are left to the compiler
+                for field in SANITIZE_FIELDS:
+                    sanitized[field] += report[field]
+                first = len(notes)
+                notes.append(batch)
+                ready = sorted(compiler.feed(notes, first))
+                actions.extend(ready)
+                telemetry.grow(compiler.seq)
+                yield group_chords(ready, chord_epsilon)
+            ready = sorted(compiler.finish())
+            actions.extend(ready)
+            yield group_chords(ready, chord_epsilon)
+        scheduler.feed(action_batches())  # Queue the first seconds before the start key
+    logger.log(f"Scheduler: {len(scheduler.heap)} queued actions, spin threshold {spin_threshold * 1000.0:.2f} ms")
+
+    # Start/stop (and optional pause) keys come from keyboard hooks; the start time is the T key-down itself
+    hotkeys = PlaybackHotkeys(pause_key=settings.get('pause_key'))
+    try:
+        hotkeys.install()
+    except RuntimeError as e:
+        emitter.close()
+        logger.log(str(e), level=ERROR)
+        return
+    # Launch -> armed (for --preset / --chart runs this is the whole startup cost)
+    if prefetched:
+        logger.log(f"Ready {(time.perf_counter() - song_started) * 1000.0:.1f} ms after the previous song (chart prefetched)")
+    else:
+        logger.log(f"Ready {(time.perf_counter() - LAUNCHED_AT) * 1000.0:.0f} ms after launch"
+                   f"{' (including time at the prompts)' if interactive else ''}")
+    start_time = wait_for_t(hotkeys)
+    if region is not None:
+        start_time -= region.start  # T is chart time region.start
+    telemetry.start(start_time)
+    if prefetch is not None:
+        prefetch.scheduler = scheduler  # From now on the prefetcher only runs in gaps between deadlines
+    logger.log("Playback started.")
 
-        # Consume all notes whose scheduled time has arrived (support bursts of simultaneous notes)
-        while note_idx < total_notes and now >= notes[note_idx]['time']:
-            note = notes[note_idx]
-            note_time = note['time']
-            lane = note['lane']
-            note_type = note.get('type', 0)
-            sustain = note.get('sustain', 0)
-
-            skip_note = False
-            if note_type == 'death' and not settings['special_note_settings'].get('death', False):
-                skip_note = True
-            if note_type == 'poison' and not settings['special_note_settings'].get('poison', False):
-                skip_note = True
-            if note_type == 'bullet':
-                skip_note = False
-
-            # For Matt/Doors optionally swap lanes based on mustHitSection
-            if chart_class_obj in (MattChartReader, DoorsChartReader) and 'must_hit_section' in note and swap_by_must_hit:
-                must_hit = note['must_hit_section']
-                player_lanes = set(base_player_lanes) if must_hit else set(base_opponent_lanes)
-                opponent_lanes = set(base_opponent_lanes) if must_hit else set(base_player_lanes)
+    held_keys = {}  # key currently held down -> lane that pressed it
+    print_presses = settings['print_presses']
+
+    def execute(action, now):
+        """Emit one compiled action or chord (called by the scheduler at its deadline)."""
+        if action.chord:
+            members = action.chord
+            for member in members:
+                telemetry.record_wake(member.seq, scheduler.start_time + now)
+            keys = tuple(dict.fromkeys(member.key for member in members))
+            slots = [member.seq for member in members]
+            if action.kind == ACTION_PRESS:
+                emitter.press_many(keys, slots)
+                for member in members:
+                    held_keys[member.key] = member.lane
+                    logger.log(member.message)
             else:
-                must_hit = None
-                player_lanes = set(base_player_lanes)
-                opponent_lanes = set(base_opponent_lanes)
+                emitter.release_many(keys, slots)
+                for member in members:
+                    held_keys.pop(member.key, None)
+                    if print_presses:
+                        logger.log("Released: {} (lane {}, time {:.3f})", member.key, member.lane, now)
+            return
+        telemetry.record_wake(action.seq, scheduler.start_time + now)
+        if action.kind == ACTION_PRESS:
+            emitter.press(action.key, action.seq)
+            held_keys[action.key] = action.lane
+            logger.log(action.message)
+        else:
+            emitter.release(action.key, action.seq)
+            held_keys.pop(action.key, None)
+            if print_presses:
+                # Formatting is deferred to the log writer thread
+                logger.log("Released: {} (lane {}, time {:.3f})", action.key, action.lane, now)
 
-            # Debug classification (first few notes) to help diagnose issues
-            if note_idx < 30 and chart_class_obj in (MattChartReader, DoorsChartReader):
-                logger.log(
-                    f"DEBUG note_idx={note_idx} t={note_time:.3f} lane={lane} mustHit={must_hit} player_lanes={sorted(player_lanes)} opp_lanes={sorted(opponent_lanes)} class={'PLAYER' if lane in player_lanes else ('OPP' if lane in opponent_lanes else 'UNKNOWN')}"
-                )
+    def stop_requested():
+        """Pressing 't' during playback aborts prematurely; the pause key holds playback."""
+        if emitter.error is not None:
+            logger.log(f"Key backend {backend_name}: {emitter.error}; stopping playback", level=ERROR)
+            return True
+        if hotkeys.paused.is_set():
+            paused_at = hotkeys.pause_time - scheduler.start_time
+            release_held_keys()
+            logger.log(f"Paused at {paused_at:.3f} s")
+            resumed = hotkeys.wait_for_resume()
+            if resumed is None:
+                return True
+            scheduler.delay(resumed - hotkeys.pause_time)
+            telemetry.pause(paused_at, resumed - hotkeys.pause_time)
+            logger.log(f"Resumed after {resumed - hotkeys.pause_time:.3f} s")
+        return hotkeys.stopped.is_set()
 
-            if lane in player_lanes:
-                if not skip_note and lane in settings['controls']:
-                    key = settings['controls'][lane]
-                    if not key:
-                        logger.log(f"WARNING: Empty key binding for lane {lane}; skipping press.")
-                        note_idx += 1
-                        continue
-                    hold_time = max(0.01, sustain / 1000.0) if sustain > 0 else 0.01  # Minimal hold for taps
-                    keyboard.press(key)
-                    held_notes[lane] = (now + hold_time, key)
-                    msg = f"Pressing: {key} (lane {lane}, time {note_time}, hold {hold_time:.3f}s)"
-                    if settings['print_presses']:
-                        logger.log(msg)
-                    else:
-                        logger.log(f"Pressed: {key} (lane {lane}, time {note_time}, hold {hold_time:.3f}s)")
-            elif lane in opponent_lanes:
-                logger.log(f"Opponent note: lane {lane}, time {note_time}, sustain {sustain}")
-            note_idx += 1
+    def release_held_keys():
+        for key, lane in held_keys.items():
+            emitter.release(key)
+            if print_presses:
+                logger.log(f"Released: {key} (lane {lane}, time {time.perf_counter() - scheduler.start_time:.3f})")
+        held_keys.clear()
 
-        # Brief sleep to reduce CPU usage; still tight for timing precision
-        time.sleep(0.001)
+    loops = 0
+    while True:
+        if not scheduler.run(start_time, execute, stop_requested):
+            logger.log("Stopped!")
+            break
+        if region is None or not seek.loop:
+            break
+        # Same steps again one region length later (pauses included); nothing is re-parsed or recompiled
+        start_time = scheduler.start_time + region.end - region.start
+        scheduler.requeue(region.steps)
+        telemetry.restart(start_time, region.actions)
+        loops += 1
+        logger.log(f"Loop {loops}: back to {region.start:.3f} s")
+    if prefetch is not None:
+        prefetch.scheduler = None
+    hotkeys.uninstall()
+    if stream:
+        presses = sum(1 for a in actions if a.kind == ACTION_PRESS)
+        logger.log(f"Streamed {stream_stats['sections']} sections, {len(notes)} notes -> {presses} presses, "
+                   f"{len(actions) - presses} releases; peak {stream_stats['peak_buffered']} notes buffered, "
+                   f"{stream_stats['late_notes']} out-of-window notes")
+        if any(sanitized.values()):
+            logger.log(f"Sanitized streamed chart: {sanitize_summary(dict(sanitized, kept=len(notes)))}")
 
     # Ensure all still-held keys get released upon termination
-    for lane, (release_time, key) in held_notes.items():
-        keyboard.release(key)
-        if settings['print_presses']:
-            logger.log(f"Released: {key} (lane {lane}, time {time.time() - start_time:.3f})")
+    release_held_keys()
+    emitter.close()
+    if emitter.failures:
+        logger.log(f"Key backend {backend_name}: {emitter.failures} key event(s) failed to send (first: {emitter.error})",
+                   level=ERROR)
+    telemetry.report(logger)
 
     logger.log("All notes played or stopped.")
+
+# Playlist prefetching: the worker only takes a step (chart decode, PREFETCH_SLICE_NOTES notes
+# normalized or compiled, one sanitize pass) when the playing song's next deadline is at least
+# PREFETCH_MIN_GAP away (or twice the longest step measured so far, if that is more), and
+# asks the OS for a lower priority where it can (PREFETCH_NICE, Linux per-thread nice).
+PREFETCH_MIN_GAP = 0.025
+PREFETCH_SLICE_NOTES = 250
+PREFETCH_NICE = 10
+
+class PrefetchWorker(threading.Thread):
+    """Loads, caches and compiles the next playlist chart while the current one plays.
+
+    Steps are kept short and only start in gaps between the scheduler's deadlines, so the
+    work (and the GIL it holds) lands in time the scheduler would sleep through anyway. With
+    no song playing (between songs, dry runs) it runs flat out. Result in .prepared (or
+    .error) once .done is set.
+    """
+    def __init__(self, settings, logger, cache=None):
+        super().__init__(name='playlist-prefetch', daemon=True)
+        self.settings = settings
+        self.logger = logger
+        self.cache = cache
+        self.scheduler = None  # Set by play_song while a song is playing
+        self.prepared = None
+        self.error = None
+        self.waited = 0.0  # Seconds spent yielding to the scheduler
+        self.longest_step = 0.0  # Longest stretch of work between two wait_for_gap() calls
+        self._step_started = None
+        self.done = threading.Event()
+
+    def wait_for_gap(self):
+        """Sleep until the scheduler's next deadline is far enough away for one step. Returns seconds waited."""
+        waited_from = time.perf_counter()
+        if self._step_started is not None:
+            self.longest_step = max(self.longest_step, waited_from - self._step_started)
+        needed = max(PREFETCH_MIN_GAP, 2.0 * self.longest_step)
+        while True:
+            scheduler = self.scheduler
+            try:
+                gap = scheduler.start_time + scheduler.heap[0].time - time.perf_counter()
+            except (AttributeError, IndexError):
+                break  # Nothing playing or nothing queued
+            if gap >= needed:
+                break
+            time.sleep(max(gap, 0.0) + 0.001)  # Look again right after that deadline, when the next gap is widest
+        self._step_started = time.perf_counter()
+        waited = self._step_started - waited_from
+        self.waited += waited
+        return waited
+
+    def run(self):
+        if hasattr(os, 'setpriority'):
+            try:
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), PREFETCH_NICE)
+            except OSError:
+                pass
+        try:
+            self.wait_for_gap()
+            self.prepared = prepare_chart(self.settings, resolve_chart_class(self.settings), self.logger,
+                                          cache=self.cache, between_steps=self.wait_for_gap,
+                                          slice_notes=PREFETCH_SLICE_NOTES)
+        except Exception as e:
+            self.error = e
+        self.done.set()
+
+def playlist_items(items):
+    """Expand --playlist arguments: .txt files list one preset name or chart path per line."""
+    expanded = []
+    for item in items:
+        if item.lower().endswith('.txt') and os.path.isfile(item):
+            with open(item, 'r', encoding='utf-8') as f:
+                expanded.extend(line.strip() for line in f if line.strip() and not line.lstrip().startswith('#'))
+        else:
+            expanded.append(item)
+    return expanded
+
+def play_playlist(args, logger):
+    """Play presets/charts back to back; the next chart is prefetched while the current one plays.
+
+    Chart paths use --preset (if given) for keys and backend, like --chart does; anything that
+    is not a file is taken as a preset name.
+    """
+    songs = []
+    for item in playlist_items(args.playlist):
+        is_chart = os.path.isfile(item)
+        item_args = type(args)(**dict(vars(args), chart=item if is_chart else None,
+                                      preset=args.preset if is_chart else item))
+        settings = cli_settings(item_args, logger)
+        if settings is None:
+            logger.log(f"Playlist: skipping {item}", level=WARNING)
+            continue
+        if args.dry_run:
+            settings['key_backend'] = 'null'
+        settings['stream'] = False  # Prefetched songs are compiled whole
+        songs.append((item, settings))
+    logger.log(f"Playlist: {len(songs)} song(s): {', '.join(item for item, _ in songs)}")
+    shared_cache = ChartCache(logger=logger)
+
+    def start_prefetch(settings):
+        worker = PrefetchWorker(settings, logger, shared_cache if settings.get('use_cache', True) else None)
+        worker.start()
+        return worker
+
+    worker = None
+    for i, (item, settings) in enumerate(songs):
+        if worker is None:
+            worker = start_prefetch(settings)
+        if not worker.done.is_set():
+            logger.log(f"Playlist: waiting for {item} to finish loading")
+        worker.done.wait()
+        current = worker
+        worker = None
+        if current.error is not None:
+            logger.log(f"Playlist: could not load {item}: {current.error}", level=ERROR)
+            continue
+        logger.log(f"Playlist {i + 1}/{len(songs)}: {item} (prefetch yielded {current.waited * 1000.0:.0f} ms to playback, "
+                   f"longest step {current.longest_step * 1000.0:.1f} ms)")
+        if i + 1 < len(songs):
+            worker = start_prefetch(songs[i + 1][1])
+        play_song(settings, logger, dry_run=args.dry_run, prepared=current.prepared, prefetch=worker)
+
+def main(argv=None):
+    """Entry point: gather settings, parse chart, then run playback loop."""
+    args = parse_args(argv)
+    if args.bench:
+        run_benchmark(args.bench, args.bench_out, args.bench_repeat)
+        return
+    if args.golden:
+        bundled = os.path.abspath(args.golden) == os.path.abspath(GOLDEN_DIR)
+        counts = run_golden_traces(args.golden, update=args.golden_update, charts=GOLDEN_CHARTS if bundled else None)
+        if not args.golden_update and (counts['differ'] or counts['missing'] or counts['error']):
+            raise SystemExit(1)
+        return
+    if args.sanitize_report:
+        run_sanitize_report(args.sanitize_report, args.bench_out)
+        return
+    if args.index is not None:
+        started = time.perf_counter()
+        indexed, unchanged, removed = ChartCatalog().update(args.index or [CHART_TYPES_DIR], args.index_workers)
+        print(f"Chart catalog updated: {indexed} indexed, {unchanged} unchanged, {removed} removed "
+              f"({time.perf_counter() - started:.2f} s) -> {CATALOG_PATH}")
+        return
+    log_path = get_log_file()
+    logger = Logger(log_path)
+    logger.log("Script started.")
+    if args.calibrate:
+        preset = load_preset(args.calibrate)
+        if preset is None:
+            logger.log(f"Preset not found: {args.calibrate}", level=ERROR)
+        else:
+            save_preset(args.calibrate, calibrate_settings(preset, logger))
+            logger.log(f"Saved lead offset to preset {args.calibrate}")
+        logger.save()
+        return
+    interactive = not (args.preset or args.chart or args.playlist)
+    seek = None
+    # 0 is a valid time / section, so only "not given" counts as unset
+    if args.loop or any(value is not None for value in (args.seek_from, args.from_section, args.seek_to, args.to_section)):
+        seek = SeekRequest(args.seek_from, args.from_section, args.seek_to, args.to_section, args.loop)
+    if args.trace and not (args.dry_run and not args.playlist):
+        logger.log("--trace only applies to a single-song --dry-run; ignored", level=WARNING)
+    if args.playlist:
+        if seek is not None:
+            logger.log("--from/--to/--loop only apply to single songs; ignored for the playlist", level=WARNING)
+        play_playlist(args, logger)
+    else:
+        settings = ask_user(logger) if interactive else cli_settings(args, logger)
+        if settings is not None:
+            play_song(settings, logger, dry_run=args.dry_run, interactive=interactive, seek=seek,
+                      trace=args.trace if args.dry_run else None)
     logger.save()
     print(f"Log saved to {log_path}")
 